@@ -1,12 +1,41 @@
 # agent_platform/backend/agents/generic.py
 
+import os
+import time
+
 from ..agents.base import BaseAgent
+from ..services.admission import ADMISSION
+from ..services.deadline import Deadline, DeadlineExceeded
+from ..services.token_budget import TokenBudgetExceeded, TokenUsage
+from ..tracing import profiler
+from ..tracing.metrics import STEP_LATENCY
+from ..utils.streams import StreamPipe
+
+LOG_PREVIEW_CHARS = 200
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "4"))   # items a producer may run ahead of its consumer
+PRODUCER_JOIN_TIMEOUT = 5.0                                     # seconds to wait for a stopped producer
+
+
+def _preview(value) -> str:
+    """Short log form of a step value; avoids repr-ing whole search results / documents."""
+    if isinstance(value, str):
+        text = value
+    else:
+        results = getattr(value, "results", None)
+        if results is not None:
+            return f"<{type(value).__name__}: {len(results)} results>"
+        text = str(value)
+    if len(text) > LOG_PREVIEW_CHARS:
+        return f"{text[:LOG_PREVIEW_CHARS]}… ({len(text)} chars)"
+    return text
 
 class GenericAgent(BaseAgent):
     def __init__(self, agent_name: str, workflow: dict, tool_registry: dict):
         """
         :param agent_name: Logical name of this agent
         :param workflow:   {"tools": [ { "name": str, "input_from": str, "config": {...} }, ... ]}
+                           Optional "streaming" (default false) pipelines a tool with
+                           `run_stream` into a following tool with `run_from_stream`.
         :param tool_registry: mapping tool_name -> tool class or instance
         """
         self.agent_name = agent_name
@@ -18,56 +47,201 @@ class GenericAgent(BaseAgent):
         # when loading from DB we don't have a file-based name
         return cls(agent_name="custom_from_db", workflow=config, tool_registry=tool_registry)
 
-    def run(self, query: str, session_id: str) -> str:
+    def run(
+        self,
+        query: str,
+        session_id: str,
+        deadline: Deadline | None = None,
+        user_id: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
         # validate top‐level structure
         if not isinstance(self.workflow, dict) or "tools" not in self.workflow:
             raise ValueError(
                 "[❌ ERROR] Invalid workflow: expected a dict with key 'tools'."
             )
 
-        context = {"query": query, "session_id": session_id}
+        # workflow may opt into returning the last completed step on timeout
+        allow_partial = bool(self.workflow.get("allow_partial", False))
+        deadline = deadline or Deadline.from_seconds(self.workflow.get("timeout"))
+
+        context = {
+            "query": query,
+            "session_id": session_id,
+            "deadline": deadline,
+            "allow_partial": allow_partial,
+            "user_id": user_id,
+            "token_usage": usage if usage is not None else TokenUsage(),
+        }
         previous_output = query
+        completed_steps = 0
+        profile = profiler.current()
 
         print(f"[GenericAgent] 🏁 Starting workflow for: {self.agent_name}")
 
-        for idx, step in enumerate(self.workflow["tools"], start=1):
+        steps = self.workflow["tools"]
+        streaming = bool(self.workflow.get("streaming", False))
+        idx = 0
+        while idx < len(steps):
+            step = steps[idx]
+            idx += 1
             tool_name = step.get("name")
             input_from = step.get("input_from", "query")
             config = step.get("config", {})
 
+            try:
+                deadline.check(f"step #{idx} '{tool_name}'")
+            except DeadlineExceeded as e:
+                return self._partial_or_raise(e, allow_partial, completed_steps, previous_output)
+
             # fetch the actual text to feed into this tool
             input_data = context.get(input_from, previous_output)
 
             print(
                 f"[GenericAgent] 🔧 Step #{idx}: Tool='{tool_name}' "
-                f"| input_from='{input_from}' → '{input_data}' "
+                f"| input_from='{input_from}' → '{_preview(input_data)}' "
                 f"| config={config}"
             )
 
-            tool_def = self.tool_registry.get(tool_name)
-            if not tool_def:
-                available = ", ".join(self.tool_registry.keys())
-                raise ValueError(
-                    f"[❌ ERROR] Tool '{tool_name}' not found. "
-                    f"Available: [{available}]"
-                )
+            tool_instance = self._instance(tool_name)
 
-            # either a class or a pre‐instantiated object
-            if isinstance(tool_def, type):
-                tool_instance = tool_def()
-            else:
-                tool_instance = tool_def
+            # a streaming producer directly feeding a streaming consumer runs as one pipelined stage
+            next_step = steps[idx] if idx < len(steps) else None
+            consumer = None
+            if (
+                streaming and next_step is not None
+                and next_step.get("input_from", "query") == tool_name
+                and hasattr(tool_instance, "run_stream")
+            ):
+                consumer = self._instance(next_step.get("name"))
+                if not hasattr(consumer, "run_from_stream"):
+                    consumer = None
 
-            try:
-                # new signature: run(text, context, config)
-                output = tool_instance.run(input_data, context, config)
-                print(f"[GenericAgent] ✅ Step #{idx} '{tool_name}' output: {output}")
-            except Exception as e:
-                print(f"[GenericAgent] ❌ Step #{idx} '{tool_name}' failed: {e}")
-                raise RuntimeError(f"Execution failed in '{tool_name}': {e}")
+            if consumer is not None:
+                outputs, stopped = self._run_pipelined(
+                    idx, step, tool_instance, next_step, consumer, input_data, context, deadline, profile
+                )
+                idx += 1
+            else:
+                try:
+                    output = self._run_step(
+                        idx, tool_name, lambda: tool_instance.run(input_data, context, config), deadline, profile
+                    )
+                    outputs, stopped = [(tool_name, output)], None
+                except DeadlineExceeded as e:
+                    outputs, stopped = [], e
 
             # store for downstream steps
-            context[tool_name] = output
-            previous_output = output
+            for name, output in outputs:
+                context[name] = output
+                previous_output = output
+                completed_steps += 1
+            if stopped is not None:
+                return self._partial_or_raise(stopped, allow_partial, completed_steps, previous_output)
 
         return previous_output
+
+    def _instance(self, tool_name: str):
+        tool_def = self.tool_registry.get(tool_name)
+        if not tool_def:
+            available = ", ".join(self.tool_registry.keys())
+            raise ValueError(
+                f"[❌ ERROR] Tool '{tool_name}' not found. "
+                f"Available: [{available}]"
+            )
+
+        # either a class or a pre‐instantiated object
+        if isinstance(tool_def, type):
+            return tool_def()
+        return tool_def
+
+    def _run_step(self, idx: int, tool_name: str, call, deadline: Deadline, profile):
+        """Run one tool call with metrics/profiling; tool errors surface as RuntimeError or DeadlineExceeded."""
+        step_start = time.perf_counter()
+        outcome = "error"
+        if profile:
+            profile.begin_step(tool_name)
+        try:
+            # new signature: run(text, context, config)
+            output = call()
+            outcome = "ok"
+            print(f"[GenericAgent] ✅ Step #{idx} '{tool_name}' output: {_preview(output)}")
+            return output
+        except DeadlineExceeded as e:
+            outcome = "timeout"
+            print(f"[GenericAgent] ⏱️ Step #{idx} '{tool_name}' stopped: {e}")
+            raise
+        except TokenBudgetExceeded:
+            outcome = "rejected"
+            print(f"[GenericAgent] 🚫 Step #{idx} '{tool_name}' rejected by token budget")
+            raise
+        except Exception as e:
+            if deadline.expired():
+                # a network timeout sized from the deadline surfaces as a tool error
+                outcome = "timeout"
+                print(f"[GenericAgent] ⏱️ Step #{idx} '{tool_name}' timed out: {e}")
+                raise DeadlineExceeded(f"Deadline exceeded in '{tool_name}': {e}")
+            print(f"[GenericAgent] ❌ Step #{idx} '{tool_name}' failed: {e}")
+            raise RuntimeError(f"Execution failed in '{tool_name}': {e}")
+        finally:
+            elapsed = time.perf_counter() - step_start
+            STEP_LATENCY.labels(tool=tool_name, outcome=outcome).observe(elapsed)
+            if outcome == "ok":
+                # feeds the adaptive concurrency limit on run endpoints
+                ADMISSION.observe_step(tool_name, elapsed)
+            if profile:
+                profile.end_step(tool_name, outcome)
+
+    def _run_pipelined(self, idx, step, producer, next_step, consumer, input_data, context, deadline, profile):
+        """
+        Run `producer.run_stream` in a background thread and hand its items to
+        `consumer.run_from_stream` through a bounded buffer as they arrive.
+        Returns ([(tool_name, output), ...], DeadlineExceeded | None) for the steps that completed.
+        """
+        prod_name, cons_name = step.get("name"), next_step.get("name")
+        prod_config, cons_config = step.get("config", {}), next_step.get("config", {})
+        buffer = int(self.workflow.get("stream_buffer") or STREAM_BUFFER_SIZE)
+        print(f"[GenericAgent] 🔀 Streaming step #{idx} '{prod_name}' → #{idx + 1} '{cons_name}' (buffer={buffer})")
+
+        pipe = StreamPipe(buffer, deadline, collect=True)
+        # the profiler samples only the run's own thread, so the producer isn't profiled
+        pipe.start(
+            lambda: self._run_step(
+                idx, prod_name, lambda: pipe.feed(producer.run_stream(input_data, context, prod_config)),
+                deadline, None,
+            ),
+            name=prod_name,
+        )
+
+        stopped = None
+        try:
+            cons_output = self._run_step(
+                idx + 1, cons_name, lambda: consumer.run_from_stream(iter(pipe), context, cons_config),
+                deadline, profile,
+            )
+        except DeadlineExceeded as e:
+            cons_output, stopped = None, e
+        except Exception:
+            # the consumer saw the producer's failure through the stream: report the producer
+            if pipe.error is not None and not isinstance(pipe.error, DeadlineExceeded):
+                raise pipe.error
+            raise
+        finally:
+            pipe.close(timeout=PRODUCER_JOIN_TIMEOUT)
+
+        if pipe.error is not None and not isinstance(pipe.error, DeadlineExceeded) and stopped is None:
+            print(f"[GenericAgent] ⚠️ '{prod_name}' failed after '{cons_name}' finished: {pipe.error}")
+
+        items = list(pipe.items)
+        assemble = getattr(producer, "assemble", None)
+        prod_output = assemble(items, input_data, prod_config) if assemble else items
+        outputs = [(prod_name, prod_output)]
+        if stopped is None:
+            outputs.append((cons_name, cons_output))
+        return outputs, stopped
+
+    def _partial_or_raise(self, error: DeadlineExceeded, allow_partial: bool, completed_steps: int, previous_output):
+        if allow_partial and completed_steps:
+            print(f"[GenericAgent] ↩️ Returning partial result after {completed_steps} step(s)")
+            return previous_output
+        raise error
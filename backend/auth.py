@@ -9,10 +9,15 @@ from pydantic import BaseModel, EmailStr
 
 from . import crud, schemas, models
 from .database import get_db
+from .services.cache import get_cache
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# seconds a resolved user may be served from cache instead of the users table
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# comma-separated emails allowed to use admin endpoints and request profiling
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -65,11 +70,28 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise JWTError()
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    principals = get_cache("principals")
+    cached = principals.get(uid) if PRINCIPAL_CACHE_TTL else None
+    if cached:
+        # detached copy: endpoints only read id / email / name
+        return models.User(id=cached["id"], email=cached["email"], name=cached["name"])
+
     user = db.query(models.User).get(int(uid))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    if PRINCIPAL_CACHE_TTL:
+        principals.set(uid, {"id": user.id, "email": user.email, "name": user.name}, ttl=PRINCIPAL_CACHE_TTL)
     return user
 
+def is_admin(user: models.User) -> bool:
+    return (user.email or "").lower() in ADMIN_EMAILS
+
+def get_admin_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
 @router.get("/me", response_model=schemas.UserOut)
 def me(current_user: models.User = Depends(get_current_user)):
     return current_user
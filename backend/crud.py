@@ -1,9 +1,12 @@
+import base64
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from uuid import uuid4
 
 from typing import Optional, List
 
+from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 
 from . import models, schemas
@@ -12,6 +15,16 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 
+# -- Keyset cursors --
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Raises ValueError on a malformed cursor."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
 # -- Users --
 
 def get_user_by_email(db: Session, email: str) -> models.User | None:
@@ -47,12 +60,39 @@ def create_tool(db: Session, tool_in: schemas.ToolCreate) -> models.Tool:
 def list_tools(db: Session) -> list[models.Tool]:
     return db.query(models.Tool).all()
 
+def list_tools_page(db: Session, limit: int, after_id: int | None = None) -> list[models.Tool]:
+    """One page ordered by id; fetches limit+1 rows so callers can tell if more exist."""
+    q = db.query(models.Tool)
+    if after_id is not None:
+        q = q.filter(models.Tool.id > after_id)
+    return q.order_by(models.Tool.id).limit(limit + 1).all()
+
 # -- Agents --
 
 def get_agents(db: Session, user_id: int) -> List[models.Agent]:
     return db.query(models.Agent).filter(models.Agent.user_id == user_id).all()
 
 
+def list_agents_page(
+    db: Session,
+    user_id: int,
+    limit: int,
+    after_id: int | None = None,
+    include_workflow: bool = False,
+) -> list:
+    """
+    One page of a user's agents ordered by id, as lightweight rows.
+    `workflow` is only selected when asked for; fetches limit+1 rows.
+    """
+    columns = [models.Agent.id, models.Agent.agent_name]
+    if include_workflow:
+        columns.append(models.Agent.workflow)
+    q = db.query(*columns).filter(models.Agent.user_id == user_id)
+    if after_id is not None:
+        q = q.filter(models.Agent.id > after_id)
+    return q.order_by(models.Agent.id).limit(limit + 1).all()
+
+
 def get_agent_by_id(db: Session, agent_id: int) -> models.Agent | None:
     return db.query(models.Agent).get(agent_id)
 
@@ -83,7 +123,11 @@ def create_agent(db: Session, a: schemas.AgentCreate) -> dict:
         workflow=workflow_data,
     )
     db.add(db_agent)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Agent name already exists for this user")
     db.refresh(db_agent)
     return {"status": "created", "agent_id": db_agent.id}
 
@@ -99,6 +143,26 @@ def update_agent(
     # again, encode ToolStep → dict
     db_agent.workflow = jsonable_encoder(payload.workflow)
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Agent name already exists for this user")
     db.refresh(db_agent)
-    return {"status": "updated", "agent_id": db_agent.id}
\ No newline at end of file
+    return {"status": "updated", "agent_id": db_agent.id}
+
+
+# -- Token usage --
+
+def record_run_usage(db: Session, user_id: int, agent_name: str, session_id: str, usage) -> None:
+    db.add(models.RunUsage(
+        user_id=user_id,
+        agent_name=agent_name,
+        session_id=session_id,
+        estimated_tokens=usage.estimated_tokens,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        llm_calls=usage.llm_calls,
+        decision=usage.decision,
+    ))
+    db.commit()
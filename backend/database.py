@@ -24,6 +24,13 @@ def init_db():
     from backend import models   # ← make sure this matches how you run uvicorn
     print("🗄️  Tables known to SQLAlchemy:", list(Base.metadata.tables.keys()))
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"⚠️  Could not create index {index.name}: {e}")
     print("✅ create_all complete")
 
 def get_db():
@@ -32,3 +39,4 @@ def get_db():
         yield db
     finally:
         db.close()
+
@@ -1,34 +1,101 @@
 # backend/main.py
+import asyncio
+import functools
 import importlib
-from fastapi import FastAPI, Depends, HTTPException, Path, Body
+import math
+import os
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import FastAPI, Depends, HTTPException, Path, Body, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.datastructures import UploadFile   # form() yields Starlette's class, not FastAPI's subclass
 
 from backend import crud, schemas, models
-from backend.database import init_db, get_db
-from backend.services.agent_runner import AgentRunner
-from backend.auth import router as auth_router, get_current_user
+from backend.database import init_db, get_db, engine, SessionLocal
+from backend.services.admission import ADMISSION, AdmissionRejected
+from backend.services.agent_runner import AgentRunner, invalidate_tool_rows
+from backend.services.deadline import Deadline, DeadlineExceeded
+from backend.services.token_budget import TokenBudgetExceeded, TokenUsage
+from backend.services.uploads import UploadedDocument, parse_upload_form
+from backend.utils.json_response import FastJSONResponse, dumps
+from backend.tracing import profiler
+from backend.tracing.metrics import REGISTRY, Gauge, MetricsMiddleware
+from backend.auth import router as auth_router, get_current_user, get_admin_user, is_admin
 
 # bring in only the pydantic parts we need
-from backend.schemas import AgentInput, AgentOutput
+from backend.schemas import AgentInput, AgentOutput, BatchRunInput
 from backend.models  import Agent, Tool, User
 
-# 1) Create all tables in Postgres
-init_db()
+# Startup work happens in the lifespan, not at import time, so importing
+# this module (tests, tooling, the uvicorn reloader) stays cheap.
+CREATE_TABLES_ON_STARTUP = os.getenv("CREATE_TABLES_ON_STARTUP", "1") == "1"
+WARMUP_TOOLS             = os.getenv("WARMUP_TOOLS", "0") == "1"
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1) Create all tables in Postgres (disable when migrations run separately,
+    #    e.g. `python -m backend.migrate` as a deploy step)
+    if CREATE_TABLES_ON_STARTUP:
+        await run_in_threadpool(init_db)
+    # 2) Optionally import registered tools before accepting traffic
+    if WARMUP_TOOLS:
+        try:
+            await run_in_threadpool(AgentRunner().warm_up)
+        except Exception as e:
+            print(f"⚠️ Tool warm-up skipped: {e}")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-Id"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # mount authentication (/signup, /login, etc.)
 app.include_router(auth_router, tags=["auth"])
 
 
+# --- Metrics (Prometheus text format) ---
+
+def _db_pool_stats() -> dict:
+    pool = engine.pool
+    stats = {}
+    for state, fn in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, fn):
+            stats[(state,)] = getattr(pool, fn)()
+    return stats
+
+
+def _threadpool_stats() -> dict:
+    # evaluated inside the /metrics handler, i.e. on the event loop
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    return {
+        ("limit",):   stats.total_tokens,
+        ("busy",):    stats.borrowed_tokens,
+        ("waiting",): stats.tasks_waiting,
+    }
+
+
+Gauge("db_pool_connections", "SQLAlchemy connection pool usage.", ("state",), callback=_db_pool_stats)
+Gauge("threadpool_workers", "Starlette/anyio worker threadpool usage and queue depth.", ("state",), callback=_threadpool_stats)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 # --- Tools & Agents management (all protected by JWT) ---
 
 @app.post("/tools", response_model=schemas.ToolOut)
@@ -37,14 +104,42 @@ def register_tool(
     db: Session = Depends(get_db),
     _: models.User = Depends(get_current_user),
 ):
-    return crud.create_tool(db, payload)
+    tool = crud.create_tool(db, payload)
+    invalidate_tool_rows()
+    return tool
+
+# List endpoints page with keyset cursors: the body stays a plain list and
+# the opaque cursor for the next page comes back in X-Next-Cursor.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE     = 500
+
+
+def _cursor_after(cursor: str | None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        return crud.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _page(rows: list, limit: int, response: Response) -> list:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(rows[-1].id)
+    return rows
+
 
 @app.get("/tools", response_model=list[schemas.ToolOut])
 def list_tools(
+    response: Response,
+    limit:    int        = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor:   str | None = None,
     db: Session = Depends(get_db),
     _: models.User = Depends(get_current_user),
 ):
-    return crud.list_tools(db)
+    rows = crud.list_tools_page(db, limit, after_id=_cursor_after(cursor))
+    return _page(rows, limit, response)
 
 @app.post("/agents")
 def create_agent(
@@ -68,100 +163,376 @@ def update_agent(
 
 @app.get("/agents")
 def list_my_agents(
+    response:         Response,
+    limit:            int        = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor:           str | None = None,
+    include_workflow: bool       = False,
     current_user: models.User = Depends(get_current_user),
     db: Session                = Depends(get_db),
 ):
     """
-    Return all agents belonging to the authenticated user.
+    Return one page of agents belonging to the authenticated user.
+    `workflow` is only loaded with include_workflow=true.
     """
-    agents = crud.get_agents(db, current_user.id)
+    rows = crud.list_agents_page(
+        db, current_user.id, limit,
+        after_id=_cursor_after(cursor),
+        include_workflow=include_workflow,
+    )
     return [
         {
             "id":         a.id,
             "agent_name": a.agent_name,
-            "workflow":   a.workflow,
+            **({"workflow": a.workflow} if include_workflow else {}),
         }
-        for a in agents
+        for a in _page(rows, limit, response)
     ]
 
 
+# --- Deadlines & client disconnects ---
+
+DISCONNECT_POLL_INTERVAL = 0.5   # seconds between client-disconnect checks
+DEADLINE_GRACE_PERIOD    = 2.0   # time a timed-out run gets to hand back a partial result
+
+
+async def _run_cancellable(request: Request, deadline: Deadline, job, on_finish=None):
+    """
+    Run blocking agent work (`job()`, arguments already bound) in the
+    threadpool while watching the client.
+    The worker cooperatively checks `deadline`; we cancel it when the client
+    disconnects and stop waiting on it once the deadline (plus grace) passes.
+    `on_finish()` runs exactly once: on the loop when the worker itself is
+    done (possibly after we've stopped waiting for it), or right away if the
+    worker can't be scheduled.
+    """
+    try:
+        task = asyncio.ensure_future(run_in_threadpool(job))
+    except BaseException:
+        if on_finish is not None:
+            on_finish()
+        raise
+    if on_finish is not None:
+        task.add_done_callback(lambda _: on_finish())
+    grace_until = None
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result()
+
+        if await request.is_disconnected():
+            print("🔌 Client disconnected – cancelling run")
+            deadline.cancel("cancelled: client disconnected")
+            # let the worker unwind at its next checkpoint, swallow its error
+            task.add_done_callback(lambda t: t.exception())
+            return None
+
+        if deadline.expired():
+            loop = asyncio.get_running_loop()
+            if grace_until is None:
+                grace_until = loop.time() + DEADLINE_GRACE_PERIOD
+            elif loop.time() >= grace_until:
+                deadline.cancel("timed out")
+                task.add_done_callback(lambda t: t.exception())
+                raise DeadlineExceeded(f"Deadline of {deadline.seconds}s exceeded")
+
+
+def _load_dynamic_registry(db: Session, label: str) -> dict[str, type]:
+    rows: list[Tool] = db.query(Tool).all()
+    registry: dict[str, type] = {}
+    print(f"🔧 Loading tools {label}:")
+    for row in rows:
+        try:
+            module = importlib.import_module(row.module_path)
+            klass  = getattr(module, row.class_name)
+            registry[row.name] = klass
+            print(f"  ✅ Loaded tool '{row.name}' → {row.module_path}.{row.class_name}")
+        except Exception as e:
+            print(f"  ❌ Failed to load tool '{row.name}': {e}")
+    return registry
+
+
+def _save_usage(user_id: int, agent_name: str, session_id: str, usage: TokenUsage) -> None:
+    # runs without LLM work have nothing worth a row
+    if not (usage.llm_calls or usage.estimated_tokens):
+        return
+    db = SessionLocal()
+    try:
+        crud.record_run_usage(db, user_id, agent_name, session_id, usage)
+    except Exception as e:
+        print(f"⚠️ Failed to record token usage: {e}")
+    finally:
+        db.close()
+
+
+PROFILE_HEADER = "X-Profile"   # "1" from an admin user profiles this request
+
+
+async def _run_workflow(
+    request: Request,
+    user: User,
+    registry: dict,
+    agent: Agent,
+    query: str,
+    session_id: str,
+    timeout: float | None,
+    on_finish=None,
+):
+    workflow = agent.workflow
+    runner = AgentRunner()
+    runner.tool_registry = registry
+    run = runner.run_agent_from_config
+
+    profile = None
+    requested = request.headers.get(PROFILE_HEADER) == "1" and is_admin(user)
+    if profiler.should_profile(requested):
+        profile = profiler.ProfileSession({
+            "route": request.url.path,
+            "user_id": user.id,
+            "session_id": session_id,
+            "query": query[:200] if isinstance(query, str) else repr(query),
+        })
+        run = functools.partial(profiler.run_profiled, profile, run)
+
+    deadline = Deadline.from_seconds(timeout, (workflow or {}).get("timeout"))
+    usage = TokenUsage()
+    release_slot = None
+    handed_off = False
+
+    def worker_done():
+        # the slot is held until the worker thread returns, even after a 499/504,
+        # and usage is saved only then so LLM calls made after we stopped waiting count
+        if release_slot is not None:
+            release_slot()
+        asyncio.ensure_future(run_in_threadpool(_save_usage, user.id, agent.agent_name, session_id, usage))
+        if on_finish is not None:
+            on_finish()
+
+    try:
+        # time spent queued for a slot counts against the run's deadline
+        release_slot = await ADMISSION.acquire(
+            user.id, max_wait=deadline.remaining(), is_disconnected=request.is_disconnected
+        )
+        job = functools.partial(
+            run, workflow,
+            query=query, session_id=session_id, deadline=deadline,
+            user_id=user.id, usage=usage,
+        )
+        handed_off = True   # from here on _run_cancellable calls worker_done, scheduled or not
+        output = await _run_cancellable(request, deadline, job, on_finish=worker_done)
+    except AdmissionRejected as e:
+        if e.status_code == 499:
+            return Response(status_code=499)
+        raise HTTPException(e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except DeadlineExceeded as e:
+        raise HTTPException(504, detail=str(e))
+    except TokenBudgetExceeded as e:
+        raise HTTPException(429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    finally:
+        if not handed_off:
+            worker_done()
+
+    if output is None and deadline.cancelled:
+        # nobody is listening any more; 499 mirrors nginx's "client closed request"
+        return Response(status_code=499)
+    # outputs are already validated models/strings: skip AgentOutput revalidation
+    response = FastJSONResponse({"output": output, "session_id": session_id})
+    if profile:
+        response.headers["X-Profile-Id"] = profile.id
+    return response
+
+
 # --- Running your agent by name ---
 
 @app.post("/run-task", response_model=AgentOutput)
-def run_task(
+async def run_task(
     payload: AgentInput,
+    request: Request,
     db:      Session = Depends(get_db),
     me:      User    = Depends(get_current_user),
 ):
     # 1) fetch the agent for this user
-    agent = (
-        db.query(Agent)
-          .filter_by(agent_name=payload.agent_name, user_id=me.id)
-          .first()
-    )
+    agent = await run_in_threadpool(crud.get_agent, db, me.id, payload.agent_name)
     if not agent:
         raise HTTPException(404, detail="Agent not found")
 
     # 2) pull every tool row & build name→class dict
-    rows: list[Tool] = db.query(Tool).all()
-    dynamic_registry: dict[str, type] = {}
-    print("🔧 Loading tools from DB:")
-    for row in rows:
+    dynamic_registry = await run_in_threadpool(_load_dynamic_registry, db, "from DB")
+
+    # 3) run under the request/agent deadline
+    return await _run_workflow(
+        request, me, dynamic_registry, agent,
+        payload.query, payload.session_id, payload.timeout,
+    )
+
+
+# --- Running your agent on an uploaded document ---
+
+@app.post("/run-task/upload", response_model=AgentOutput)
+async def run_task_upload(
+    request: Request,
+    db:      Session = Depends(get_db),
+    me:      User    = Depends(get_current_user),
+):
+    """
+    Multipart form: agent_name, session_id, file, optional timeout.
+    The document replaces the text query as the workflow's first input.
+    """
+    form = await parse_upload_form(request)
+    handed_off = False
+    try:
+        upload = form.get("file")
+        agent_name = form.get("agent_name")
+        session_id = form.get("session_id")
+        if not isinstance(upload, UploadFile) or not agent_name or not session_id:
+            raise HTTPException(422, detail="Expected form fields: agent_name, session_id, file")
         try:
-            module = importlib.import_module(row.module_path)
-            klass  = getattr(module, row.class_name)
-            dynamic_registry[row.name] = klass
-            print(f"  ✅ Loaded tool '{row.name}' → {row.module_path}.{row.class_name}")
-        except Exception as e:
-            print(f"  ❌ Failed to load tool '{row.name}': {e}")
+            timeout = float(form["timeout"]) if form.get("timeout") else None
+        except ValueError:
+            raise HTTPException(422, detail="timeout must be a number")
 
-    # 3) instantiate & inject
-    runner = AgentRunner()
-    runner.tool_registry = dynamic_registry
+        agent = await run_in_threadpool(crud.get_agent, db, me.id, agent_name)
+        if not agent:
+            raise HTTPException(404, detail="Agent not found")
+        registry = await run_in_threadpool(_load_dynamic_registry, db, "for upload")
 
-    # 4) run
-    output = runner.run_agent_from_config(
-        agent.workflow,
-        query=payload.query,
-        session_id=payload.session_id,
-    )
+        document = await run_in_threadpool(UploadedDocument, upload)
 
-    return AgentOutput(output=output, session_id=payload.session_id)
+        def release_upload():
+            # the worker may outlive the request (499/504): only now is nobody reading the file
+            document.close()
+            asyncio.ensure_future(form.close())
+
+        handed_off = True
+        return await _run_workflow(
+            request, me, registry, agent, document, session_id, timeout, on_finish=release_upload
+        )
+    finally:
+        if not handed_off:
+            await form.close()
 
 
 # --- Running your agent by ID (query‐params style) ---
 
 @app.post("/run-agent", response_model=AgentOutput)
-def run_agent_by_id(
+async def run_agent_by_id(
     agent_id:    int,
     query:       str,
     session_id:  str,
+    request:     Request,
+    timeout:     float | None = None,
     db:          Session = Depends(get_db),
-    _:           User    = Depends(get_current_user),
+    me:          User    = Depends(get_current_user),
 ):
     # 1) fetch by ID
-    db_agent = crud.get_agent_by_id(db, agent_id)
+    db_agent = await run_in_threadpool(crud.get_agent_by_id, db, agent_id)
     if not db_agent:
         raise HTTPException(404, "Agent not found")
 
     # 2) load tools again
-    rows = db.query(Tool).all()
-    registry: dict[str, type] = {}
-    print(f"🔧 Loading tools for agent_id={agent_id}:")
-    for row in rows:
-        try:
-            mod   = importlib.import_module(row.module_path)
-            klass = getattr(mod, row.class_name)
-            registry[row.name] = klass
-            print(f"  ✅ Loaded tool '{row.name}' → {row.module_path}.{row.class_name}")
-        except Exception as e:
-            print(f"  ❌ Failed to load tool '{row.name}': {e}")
+    registry = await run_in_threadpool(_load_dynamic_registry, db, f"for agent_id={agent_id}")
 
     # 3) inject & run
+    return await _run_workflow(request, me, registry, db_agent, query, session_id, timeout)
+
+
+# --- Running one agent over many queries ---
+
+@app.post("/run-batch")
+async def run_batch(
+    payload: BatchRunInput,
+    db:      Session = Depends(get_db),
+    me:      User    = Depends(get_current_user),
+):
+    """
+    Run one agent over a list of queries with bounded parallelism.
+    Tool instances are built once and shared by every item; results stream
+    back as NDJSON lines in completion order, each tagged with its index.
+    """
+    agent = await run_in_threadpool(crud.get_agent, db, me.id, payload.agent_name)
+    if not agent:
+        raise HTTPException(404, detail="Agent not found")
+    workflow = agent.workflow
+    agent_name = agent.agent_name
+
     runner = AgentRunner()
-    runner.tool_registry = registry
+    await run_in_threadpool(runner.prepare_shared_tools, workflow)
 
-    result = runner.run_agent_from_config(
-        db_agent.workflow, query=query, session_id=session_id
-    )
-    return AgentOutput(output=result, session_id=session_id)
+    # more parallel items than the caller's per-user admission limit would only queue
+    concurrency = payload.max_concurrency
+    if ADMISSION.enabled and ADMISSION.per_user:
+        concurrency = min(concurrency, ADMISSION.per_user)
+    semaphore = asyncio.Semaphore(concurrency)
+    deadlines: list[Deadline] = []
+
+    async def run_one(idx: int, query: str) -> dict:
+        async with semaphore:
+            deadline = Deadline.from_seconds(payload.timeout, workflow.get("timeout"))
+            deadlines.append(deadline)
+            usage = TokenUsage()
+            session_id = f"{payload.session_id}:{idx}"
+            try:
+                # items share the caller's per-user limit and may wait for a slot until
+                # their own deadline rather than the interactive queue-time cap
+                release_slot = await ADMISSION.acquire(
+                    me.id, max_wait=deadline.remaining(), queue_for_user=True, cap_wait=False
+                )
+                worker = asyncio.ensure_future(run_in_threadpool(
+                    runner.run_agent_from_config, workflow,
+                    query=query,
+                    session_id=session_id,
+                    deadline=deadline,
+                    reload=False,
+                    user_id=me.id,
+                    usage=usage,
+                ))
+                def worker_done(task):
+                    # released (and usage saved) when the thread returns, not when this item is cancelled
+                    release_slot()
+                    asyncio.ensure_future(run_in_threadpool(_save_usage, me.id, agent_name, session_id, usage))
+                    if not task.cancelled():
+                        task.exception()   # retrieved even if nobody awaits it any more
+
+                worker.add_done_callback(worker_done)
+                output = await asyncio.shield(worker)
+                return {"index": idx, "query": query, "output": output, "error": None}
+            except Exception as e:
+                return {"index": idx, "query": query, "output": None, "error": str(e)}
+
+    async def stream():
+        tasks = [asyncio.ensure_future(run_one(i, q)) for i, q in enumerate(payload.queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield dumps(await next_done) + b"\n"
+        finally:
+            # client went away (or we finished): drop queued items, stop running ones
+            for task in tasks:
+                task.cancel()
+            for deadline in deadlines:
+                deadline.cancel("cancelled: batch stream closed")
+
+    print(f"📦 Batch run: {len(payload.queries)} queries on '{payload.agent_name}' "
+          f"(concurrency={concurrency})")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# --- Admin: stored run profiles ---
+
+@app.get("/admin/profiles")
+def list_profiles(_: User = Depends(get_admin_user)):
+    return profiler.STORE.list()
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, _: User = Depends(get_admin_user)):
+    report = profiler.STORE.get(profile_id)
+    if not report:
+        raise HTTPException(404, "Profile not found")
+    return FastJSONResponse(report)
+
+@app.get("/admin/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def get_profile_collapsed(profile_id: str, _: User = Depends(get_admin_user)):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope."""
+    report = profiler.STORE.get(profile_id)
+    if not report:
+        raise HTTPException(404, "Profile not found")
+    return PlainTextResponse(report["collapsed"])
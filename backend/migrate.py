@@ -0,0 +1,12 @@
+# backend/migrate.py
+"""
+Explicit schema step for deploys: `python -m backend.migrate`.
+
+Lives outside backend/database.py on purpose: running that module with -m
+would execute it as `__main__`, a second module with its own `Base`, and
+the models (which import `backend.database`) would register elsewhere.
+"""
+from backend.database import init_db
+
+if __name__ == "__main__":
+    init_db()
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, Index, DateTime, func
 from sqlalchemy.orm import relationship, declarative_base
 from .database import Base 
 
@@ -24,6 +24,13 @@ class Agent(Base):
 
     owner = relationship("User", back_populates="agents")
 
+    __table_args__ = (
+        # run path looks agents up by (user_id, agent_name); names are unique per user
+        Index("ux_agents_user_id_agent_name", "user_id", "agent_name", unique=True),
+        # keyset pagination of a user's agents
+        Index("ix_agents_user_id_id", "user_id", "id"),
+    )
+
 
 class Tool(Base):
     __tablename__ = "tools"
@@ -33,3 +40,18 @@ class Tool(Base):
     description = Column(String)
     module_path = Column(String, nullable=False)
     class_name  = Column(String, nullable=False)
+
+
+class RunUsage(Base):
+    __tablename__ = "run_usage"
+
+    id                = Column(Integer, primary_key=True, index=True)
+    user_id           = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    agent_name        = Column(String)
+    session_id        = Column(String)
+    estimated_tokens  = Column(Integer, nullable=False, default=0)
+    prompt_tokens     = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    llm_calls         = Column(Integer, nullable=False, default=0)
+    decision          = Column(String)          # admit | downgrade
+    created_at        = Column(DateTime, server_default=func.now(), index=True)
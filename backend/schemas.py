@@ -47,14 +47,23 @@ class ToolStep(BaseModel):
     input_from: str = "query"
     config: Dict[str, Any] = Field(default_factory=dict)
 
+class Workflow(BaseModel):
+    tools: List[ToolStep]
+    timeout: Optional[float] = None      # per-run deadline in seconds
+    allow_partial: bool = False          # return last completed step on timeout
+    streaming: bool = False              # opt in: pipeline streaming-capable steps
+    stream_buffer: Optional[int] = Field(default=None, ge=1, le=256)  # items buffered between them
+
+    model_config = { "extra": "allow" }
+
 class AgentCreate(BaseModel):
     agent_name: str
     user_email: str          # <-- renamed from user_id
-    workflow: Dict[str, List[ToolStep]]
+    workflow: Workflow
 
 class AgentUpdate(BaseModel):
     agent_name: str | None = None
-    workflow: Dict[str, List[ToolStep]]
+    workflow: Workflow
 
 
 class WebSearchResult(BaseModel):
@@ -74,6 +83,14 @@ class AgentInput(BaseModel):
     session_id: str
     agent_name: str
     user_id: int
+    timeout: Optional[float] = None      # overrides the agent's workflow timeout
+
+class BatchRunInput(BaseModel):
+    agent_name: str
+    session_id: str
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    max_concurrency: int = Field(4, ge=1, le=16)
+    timeout: Optional[float] = None      # per-item deadline
 
 class AgentOutput(BaseModel):
     # <-- allow either a plain string or a full WebSearchOutput
@@ -0,0 +1,295 @@
+# backend/services/admission.py
+"""
+Admission control for run endpoints.
+
+A run needs a slot: at most `limit` runs in flight per worker and at most
+ADMISSION_PER_USER per user. Requests that don't fit wait in a bounded FIFO
+queue for up to ADMISSION_MAX_QUEUE_TIME; past that, or when the queue is
+full, they are turned away immediately with a Retry-After hint instead of
+piling up in the threadpool until the client gives up.
+
+The global limit adapts (AIMD) to observed step latency. For each tool the
+recent steps are ranked against that tool's own longer history: in steady
+state about 10% of them are slower than its p90, whatever the mix of cache
+hits and step sizes. When a much larger share is, steps are queueing and the
+limit shrinks; when runs saturate the limit and latency is back to normal it
+grows by one.
+
+Slots are granted and released on the event loop; step observations arrive
+from worker threads and only touch the latency state, under a lock.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from ..tracing.metrics import ADMISSION_DECISIONS, Gauge
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))    # 0 disables admission control
+ADMISSION_MIN_CONCURRENCY = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "4"))
+ADMISSION_PER_USER        = int(os.getenv("ADMISSION_PER_USER", "8"))            # 0 = no per-user limit
+ADMISSION_QUEUE_SIZE      = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_MAX_QUEUE_TIME  = float(os.getenv("ADMISSION_MAX_QUEUE_TIME", "10"))   # seconds
+ADMISSION_ADAPTIVE        = os.getenv("ADMISSION_ADAPTIVE", "1") == "1"
+ADMISSION_SLOW_FRACTION   = float(os.getenv("ADMISSION_SLOW_FRACTION", "0.3"))  # share of recent steps above p90 before shrinking
+
+ADJUST_INTERVAL = 1.0      # seconds between limit changes
+DECREASE_FACTOR = 0.9
+EWMA_ALPHA      = 0.1
+RECENT_WINDOW   = 32       # latest steps per tool, compared against...
+HISTORY_WINDOW  = 512      # ...the tool's steps before them
+MIN_HISTORY     = 64       # per tool before it contributes a signal
+REFERENCE_PCT   = 0.9      # steady state: 1 - REFERENCE_PCT of recent steps are above it
+POLL_INTERVAL   = 0.5      # client-disconnect checks while queued
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("future", "user_key")
+
+    def __init__(self, future: asyncio.Future, user_key):
+        self.future = future
+        self.user_key = user_key
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_concurrency: int,
+        per_user: int,
+        queue_size: int,
+        max_queue_time: float,
+        adaptive: bool = True,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency or 1))
+        self.per_user = per_user
+        self.queue_size = queue_size
+        self.max_queue_time = max_queue_time
+        self.adaptive = adaptive
+
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self._per_user: dict = {}
+        self._waiters: deque = deque()
+
+        # latency state, fed from worker threads
+        self._lock = threading.Lock()
+        self._latencies: dict = {}     # tool -> deque of recent step latencies
+        self._samples = 0              # observations since the last adjustment
+        self._run_seconds = 1.0        # EWMA of slot hold time, for Retry-After
+        self._last_adjust = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    # --- latency feedback ---
+
+    def observe_step(self, tool: str, seconds: float) -> None:
+        """Called by the agent after every successful step."""
+        if not (self.enabled and self.adaptive):
+            return
+        with self._lock:
+            window = self._latencies.get(tool)
+            if window is None:
+                window = self._latencies[tool] = deque(maxlen=HISTORY_WINDOW + RECENT_WINDOW)
+            window.append(seconds)
+            self._samples += 1
+
+    def slow_fraction(self) -> Optional[float]:
+        """Share of recent steps slower than their tool's historical p90 (~0.1 when steady)."""
+        with self._lock:
+            windows = [list(w) for w in self._latencies.values() if len(w) >= MIN_HISTORY + RECENT_WINDOW]
+        slow = total = 0
+        for window in windows:
+            history = sorted(window[:-RECENT_WINDOW])
+            reference = history[int(len(history) * REFERENCE_PCT)]
+            recent = window[-RECENT_WINDOW:]
+            slow += sum(1 for seconds in recent if seconds > reference)
+            total += len(recent)
+        return slow / total if total else None
+
+    def _adjust(self) -> None:
+        if not self.adaptive:
+            return
+        now = time.monotonic()
+        if now - self._last_adjust < ADJUST_INTERVAL:
+            return
+        with self._lock:
+            samples, self._samples = self._samples, 0
+        if not samples:
+            return   # no fresh signal (e.g. idle): keep the current limit
+        fraction = self.slow_fraction()
+        if fraction is None:
+            return
+        if fraction > ADMISSION_SLOW_FRACTION:
+            new_limit = max(self.min_concurrency, math.floor(self.limit * DECREASE_FACTOR))
+        elif fraction <= (1 - REFERENCE_PCT) * 1.5 and self.in_flight + len(self._waiters) >= self.limit:
+            new_limit = min(self.max_concurrency, self.limit + 1)
+        else:
+            return
+        if new_limit != self.limit:
+            print(f"🚦 Admission limit {self.limit} → {new_limit} ({fraction:.0%} of recent steps above their p90)")
+            self.limit = new_limit
+        self._last_adjust = now
+
+    # --- slots ---
+
+    def retry_after(self) -> float:
+        """Rough time until a slot frees up for a new arrival."""
+        backlog = len(self._waiters) + 1
+        return min(60.0, max(1.0, self._run_seconds * backlog / max(1, self.limit)))
+
+    def _user_has_room(self, user_key) -> bool:
+        return not self.per_user or self._per_user.get(user_key, 0) < self.per_user
+
+    def _take(self, user_key) -> None:
+        self.in_flight += 1
+        self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+
+    def _grant_waiters(self) -> None:
+        """Hand free slots to queued requests in FIFO order, skipping users at their limit."""
+        for waiter in list(self._waiters):
+            if self.in_flight >= self.limit:
+                break
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+            elif self._user_has_room(waiter.user_key):
+                self._waiters.remove(waiter)
+                self._take(waiter.user_key)
+                waiter.future.set_result(True)
+
+    def _release(self, user_key, held: float) -> None:
+        self.in_flight -= 1
+        count = self._per_user.get(user_key, 1) - 1
+        if count:
+            self._per_user[user_key] = count
+        else:
+            self._per_user.pop(user_key, None)
+        self._run_seconds += (held - self._run_seconds) * EWMA_ALPHA
+        self._adjust()
+        self._grant_waiters()
+
+    async def _acquire(
+        self,
+        user_key,
+        max_wait: Optional[float],
+        queue_for_user: bool,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+        cap_wait: bool = True,
+    ) -> None:
+        self._adjust()
+        user_ok = self._user_has_room(user_key)
+        if not user_ok and not queue_for_user:
+            ADMISSION_DECISIONS.labels(result="rejected_user").inc()
+            raise AdmissionRejected(
+                429, f"Too many concurrent runs (limit {self.per_user} per user)", self.retry_after()
+            )
+        if user_ok and self.in_flight < self.limit and not self._waiters:
+            self._take(user_key)
+            ADMISSION_DECISIONS.labels(result="admitted").inc()
+            return
+        if len(self._waiters) >= self.queue_size:
+            ADMISSION_DECISIONS.labels(result="rejected_queue").inc()
+            raise AdmissionRejected(503, "Server busy: run queue is full", self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), user_key)
+        self._waiters.append(waiter)
+        self._grant_waiters()   # the limit may have just grown
+        if cap_wait:
+            wait = self.max_queue_time if max_wait is None else min(max_wait, self.max_queue_time)
+        else:
+            wait = float("inf") if max_wait is None else max_wait
+        give_up_at = loop.time() + wait
+        try:
+            while True:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait({waiter.future}, timeout=min(remaining, POLL_INTERVAL))
+                if done:
+                    ADMISSION_DECISIONS.labels(result="queued").inc()
+                    return
+                if is_disconnected is not None and await is_disconnected():
+                    ADMISSION_DECISIONS.labels(result="abandoned").inc()
+                    raise AdmissionRejected(499, "Client disconnected while queued", 0.0)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        self._abandon(waiter)
+        ADMISSION_DECISIONS.labels(result="timeout").inc()
+        raise AdmissionRejected(503, f"Server busy: no run slot within {wait:g}s", self.retry_after())
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # granted in the same tick we gave up: hand the slot straight back
+            self._release(waiter.user_key, 0.0)
+        else:
+            waiter.future.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    async def acquire(
+        self,
+        user_key,
+        max_wait: Optional[float] = None,
+        queue_for_user: bool = False,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        cap_wait: bool = True,
+    ) -> Callable[[], None]:
+        """
+        Take a run slot and return its (idempotent) release function. Call it
+        when the work is really over, e.g. from the worker task's done-callback,
+        not when the request stops waiting for it. Raises AdmissionRejected
+        (429 per-user limit, 503 queue full / queue timeout, 499 client gone).
+        `queue_for_user` queues instead of rejecting when the user is at their
+        limit; `cap_wait=False` waits up to `max_wait` (None: indefinitely)
+        instead of at most ADMISSION_MAX_QUEUE_TIME.
+        """
+        if not self.enabled:
+            return lambda: None
+        await self._acquire(user_key, max_wait, queue_for_user, is_disconnected, cap_wait)
+        started = time.monotonic()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release(user_key, time.monotonic() - started)
+
+        return release
+
+    def stats(self) -> dict:
+        return {
+            ("limit",):     self.limit,
+            ("in_flight",): self.in_flight,
+            ("queued",):    len(self._waiters),
+        }
+
+
+ADMISSION = AdmissionController(
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MIN_CONCURRENCY,
+    ADMISSION_PER_USER,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_MAX_QUEUE_TIME,
+    ADMISSION_ADAPTIVE,
+)
+
+Gauge("admission_runs", "Run admission: adaptive limit, runs in flight, queued requests.", ("state",),
+      callback=ADMISSION.stats)
@@ -1,10 +1,31 @@
 # backend/app/services/agent_runner.py
 
 import importlib
+import os
 from sqlalchemy.orm import Session
 from ..database     import SessionLocal
 from ..models       import Tool as ToolModel
 from ..agents.generic import GenericAgent
+from .deadline      import Deadline
+from .token_budget  import TokenUsage
+from .cache         import get_cache
+
+# how long a worker may reuse the tools table before re-reading it
+TOOL_ROWS_TTL = float(os.getenv("TOOL_ROWS_TTL", "30"))
+TOOL_ROWS_KEY = "all"
+
+
+def _fetch_tool_rows() -> list[tuple[str, str, str]]:
+    db: Session = SessionLocal()
+    try:
+        return [(t.name, t.module_path, t.class_name) for t in db.query(ToolModel).all()]
+    finally:
+        db.close()
+
+
+def invalidate_tool_rows() -> None:
+    """Call after registering a tool so it shows up on the next run."""
+    get_cache("tool_rows").delete(TOOL_ROWS_KEY)
 
 class AgentRunner:
     def __init__(self):
@@ -12,29 +33,65 @@ class AgentRunner:
         self.tool_registry = {}
 
     def _reload_tool_registry(self) -> None:
-        """Fetch all tools from the DB and import them fresh."""
-        db: Session = SessionLocal()
-        tools = db.query(ToolModel).all()
-        db.close()
+        """Fetch all tools (cached briefly across workers) and import them."""
+        if TOOL_ROWS_TTL > 0:
+            tools = get_cache("tool_rows").get_or_compute(TOOL_ROWS_KEY, _fetch_tool_rows, ttl=TOOL_ROWS_TTL)
+        else:
+            tools = _fetch_tool_rows()
 
         registry = {}
-        for t in tools:
+        for name, module_path, class_name in tools:
             try:
-                module = importlib.import_module(t.module_path)
-                cls    = getattr(module, t.class_name)
-                registry[t.name] = cls
-                print(f"[✅ TOOL LOADED] {t.name}: {t.module_path}.{t.class_name}")
+                module = importlib.import_module(module_path)
+                cls    = getattr(module, class_name)
+                registry[name] = cls
+                print(f"[✅ TOOL LOADED] {name}: {module_path}.{class_name}")
             except Exception as e:
-                print(f"[❌ TOOL LOAD FAILED] {t.name}: {e!r}")
+                print(f"[❌ TOOL LOAD FAILED] {name}: {e!r}")
 
         if not registry:
             # Warn early if DB was empty or module_paths were wrong
             raise RuntimeError("[❌ ERROR] No tools loaded from database!")
         self.tool_registry = registry
 
-    def run_agent_from_config(self, config: dict, query: str, session_id: str) -> str:
-        # reload *every* invocation so newly-registered tools show up immediately
+    def warm_up(self) -> None:
+        """Import every registered tool and let it pre-load heavy dependencies."""
         self._reload_tool_registry()
+        for name, cls in self.tool_registry.items():
+            warm = getattr(cls, "warm_up", None)
+            if warm is None:
+                continue
+            try:
+                warm()
+                print(f"[🔥 TOOL WARMED] {name}")
+            except Exception as e:
+                print(f"[❌ TOOL WARM-UP FAILED] {name}: {e!r}")
+
+    def prepare_shared_tools(self, config: dict) -> None:
+        """
+        Load the registry once and instantiate the tools `config` uses, so many
+        runs of the same workflow share tool instances (API clients, HTTP pools).
+        """
+        self._reload_tool_registry()
+        for step in config.get("tools", []):
+            tool_def = self.tool_registry.get(step.get("name"))
+            if isinstance(tool_def, type):
+                self.tool_registry[step["name"]] = tool_def()
+
+    def run_agent_from_config(
+        self,
+        config: dict,
+        query: str,
+        session_id: str,
+        deadline: Deadline | None = None,
+        reload: bool = True,
+        user_id: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
+        # reload *every* invocation so newly-registered tools show up immediately
+        # (batch runs prepare the registry once and pass reload=False)
+        if reload or not self.tool_registry:
+            self._reload_tool_registry()
 
         agent = GenericAgent.from_config(config, self.tool_registry)
-        return agent.run(query, session_id)
+        return agent.run(query, session_id, deadline=deadline, user_id=user_id, usage=usage)
@@ -0,0 +1,291 @@
+# backend/services/article_cache.py
+"""
+Host-wide cache of fetched and parsed web articles.
+
+Entries are keyed by normalized URL and hold the extracted title/text
+(zstd-compressed) plus the response validators. A fresh entry is served
+without touching the network; a stale one is revalidated with a conditional
+GET and a 304 reuses the parsed text, so only changed pages are downloaded
+and run through newspaper again. The store is bounded by total compressed
+size, least recently used entries going first.
+"""
+import codecs
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import orjson
+import requests
+
+from ..tracing.metrics import record_cache
+from .cache import CACHE_DIR, open_private_db
+
+ARTICLE_CACHE_PATH      = os.getenv("ARTICLE_CACHE_PATH", os.path.join(CACHE_DIR, "articles.sqlite3"))
+ARTICLE_CACHE_MAX_BYTES = int(os.getenv("ARTICLE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+ARTICLE_CACHE_FRESH_FOR = float(os.getenv("ARTICLE_CACHE_FRESH_FOR", "3600"))   # when the server gives no max-age
+ARTICLE_CACHE_MAX_FRESH = float(os.getenv("ARTICLE_CACHE_MAX_FRESH", "86400"))  # cap on server max-age
+ARTICLE_CACHE_LEVEL     = int(os.getenv("ARTICLE_CACHE_LEVEL", "3"))             # zstd compression level
+
+USER_AGENT = "Mozilla/5.0 (compatible; AgentPlatform/1.0; +article-fetcher)"
+
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref_src|igshid)$", re.I)
+_MAX_AGE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*(\d+)", re.I)
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+
+class NotHTMLError(ValueError):
+    """The URL served something other than an HTML page (PDF, image, JSON...)."""
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lowercase scheme/host, no default port, fragment or tracking params, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAMS.match(k)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _freshness(headers) -> Optional[float]:
+    """Seconds the response may be served without revalidation; None if it must not be stored."""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control.lower():
+        return None
+    if "no-cache" in cache_control.lower():
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return min(float(match.group(1)), ARTICLE_CACHE_MAX_FRESH)
+    return ARTICLE_CACHE_FRESH_FOR
+
+
+def _decode_html(response: requests.Response) -> str:
+    """
+    Body as text. requests falls back to ISO-8859-1 for text/html without a
+    charset, which garbles UTF-8 pages; use the header charset, else the
+    page's <meta> charset, else the detected encoding.
+    """
+    content = response.content
+    if "charset" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        encoding = response.encoding
+    else:
+        match = _META_CHARSET.search(content[:4096])
+        encoding = match.group(1).decode("ascii") if match else None
+        try:
+            codecs.lookup(encoding or "")
+        except LookupError:
+            encoding = response.apparent_encoding or "utf-8"
+    return content.decode(encoding, errors="replace")
+
+
+class ArticleCache:
+    """Compressed article store in a WAL-mode SQLite file; one connection per thread."""
+
+    EVICT_EVERY = 64   # writes between eviction passes
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                url           TEXT PRIMARY KEY,
+                body          BLOB NOT NULL,
+                etag          TEXT,
+                last_modified TEXT,
+                fetched_at    REAL NOT NULL,
+                fresh_until   REAL NOT NULL,
+                accessed_at   REAL NOT NULL,
+                size          INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_articles_accessed_at ON articles (accessed_at);
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = open_private_db(self.path)
+        return conn
+
+    @staticmethod
+    def _compress(title: str, text: str) -> bytes:
+        import zstandard
+        return zstandard.ZstdCompressor(level=ARTICLE_CACHE_LEVEL).compress(orjson.dumps([title, text]))
+
+    @staticmethod
+    def _decompress(blob: bytes) -> Tuple[str, str]:
+        import zstandard
+        title, text = orjson.loads(zstandard.ZstdDecompressor().decompress(blob))
+        return title, text
+
+    def get(self, url: str):
+        """(title, text, etag, last_modified, fresh_until) or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT body, etag, last_modified, fresh_until FROM articles WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE articles SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        title, text = self._decompress(row[0])
+        return title, text, row[1], row[2], row[3]
+
+    def put(self, url: str, title: str, text: str, etag, last_modified, fresh_for: float) -> None:
+        blob = self._compress(title, text)
+        if len(blob) > self.max_bytes // 16:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO articles "
+            "(url, body, etag, last_modified, fetched_at, fresh_until, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, blob, etag, last_modified, now, now + fresh_for, now, len(blob)),
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def touch(self, url: str, etag, last_modified, fresh_for: float) -> None:
+        """Record a successful revalidation (304): the stored text is current again."""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE articles SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+            "fetched_at = ?, fresh_until = ?, accessed_at = ? WHERE url = ?",
+            (etag, last_modified, now, now + fresh_for, now, url),
+        )
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()
+        if total <= self.max_bytes:
+            return
+        # drop least recently used entries until we are 10% under the limit
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for url, size in conn.execute("SELECT url, size FROM articles ORDER BY accessed_at"):
+            victims.append((url,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM articles WHERE url = ?", victims)
+        print(f"🧹 Article cache evicted {len(victims)} entries ({freed} bytes)")
+
+
+class ArticleFetcher:
+    """Fetch + parse articles through the cache; safe to share between threads."""
+
+    def __init__(self, store: Optional[ArticleCache]):
+        self.store = store
+        # pooled connections, reused across runs
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def _lookup(self, key: str):
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            print(f"⚠️ Article cache read failed: {e}")
+            return None
+
+    def _store(self, method: str, *args) -> None:
+        if self.store is None:
+            return
+        try:
+            getattr(self.store, method)(*args)
+        except Exception as e:
+            print(f"⚠️ Article cache write failed: {e}")
+
+    def fetch(self, url: str, timeout: float) -> Tuple[str, str, str]:
+        """
+        Returns (title, text, status) with status "fresh", "revalidated",
+        "fetched" or "stale" (revalidation failed, cached copy served).
+        Network and HTTP errors propagate when there is no cached copy;
+        a non-HTML response raises NotHTMLError and is never cached.
+        """
+        key = normalize_url(url)
+        cached = self._lookup(key)
+        if cached is not None and cached[4] >= time.time():
+            record_cache("articles", True)
+            return cached[0], cached[1], "fresh"
+
+        headers = {}
+        if cached is not None:
+            if cached[2]:
+                headers["If-None-Match"] = cached[2]
+            if cached[3]:
+                headers["If-Modified-Since"] = cached[3]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException:
+            if cached is None:
+                record_cache("articles", False)
+                raise
+            print(f"   ⚠️ Revalidation failed - serving stale copy of {url}")
+            record_cache("articles", True)
+            return cached[0], cached[1], "stale"
+
+        fresh_for = _freshness(response.headers)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if response.status_code == 304 and cached is not None:
+            record_cache("articles", True)
+            if fresh_for is not None:
+                self._store("touch", key, etag, last_modified, fresh_for)
+            return cached[0], cached[1], "revalidated"
+
+        record_cache("articles", False)
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in _HTML_TYPES:
+            raise NotHTMLError(f"not an HTML page ({content_type})")
+        title, text = self._parse(url, _decode_html(response))
+        if fresh_for is not None:
+            self._store("put", key, title, text, etag, last_modified, fresh_for)
+        return title, text, "fetched"
+
+    @staticmethod
+    def _parse(url: str, html: str) -> Tuple[str, str]:
+        from newspaper import Article
+        art = Article(url)
+        art.download(input_html=html)
+        art.parse()
+        return art.title, art.text
+
+
+_fetcher: Optional[ArticleFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_article_fetcher() -> ArticleFetcher:
+    """Process-wide fetcher; set ARTICLE_CACHE_PATH='' to fetch without caching."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                store = None
+                if ARTICLE_CACHE_PATH:
+                    try:
+                        store = ArticleCache(ARTICLE_CACHE_PATH, ARTICLE_CACHE_MAX_BYTES)
+                    except (sqlite3.Error, OSError) as e:
+                        print(f"⚠️ Article cache disabled ({ARTICLE_CACHE_PATH}): {e}")
+                _fetcher = ArticleFetcher(store)
+    return _fetcher
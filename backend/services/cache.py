@@ -0,0 +1,360 @@
+# backend/services/cache.py
+"""
+Two-level cache shared by tools and services.
+
+L1 is a small in-process LRU; L2 is a SQLite file in WAL mode that every
+uvicorn worker on the host opens, so an entry computed by one worker is a hit
+for all of them. `get_or_compute` is single-flight within a process (per-key
+lock) and across processes (a lease row in the `leases` table): concurrent
+misses for the same key wait for the first computation instead of repeating it.
+
+Values must be JSON-serializable (they are stored with orjson and come back as
+plain dicts/lists/strings); callers rebuild models themselves. The L2 file
+lives in a directory only the service user can access, and a file the
+service doesn't own is never opened.
+"""
+import hashlib
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import orjson
+
+from ..tracing.metrics import record_cache
+
+CACHE_DIR             = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), f"agent_platform-{os.getuid()}"))
+CACHE_DB_PATH         = os.getenv("CACHE_DB_PATH", os.path.join(CACHE_DIR, "cache.sqlite3"))
+CACHE_MAX_ENTRIES     = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_MAX_VALUE_BYTES = int(os.getenv("CACHE_MAX_VALUE_BYTES", str(2 * 1024 * 1024)))
+CACHE_L1_SIZE         = int(os.getenv("CACHE_L1_SIZE", "1024"))
+CACHE_L1_MAX_TTL      = float(os.getenv("CACHE_L1_MAX_TTL", "60"))   # bounds staleness vs. other workers
+
+_MISSING = object()
+
+
+def ensure_private_dir(path: str) -> str:
+    """Create `path` with mode 0700, or verify an existing one is ours and not shared."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid():
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if st.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {oct(st.st_mode & 0o777)})")
+    return path
+
+
+def check_owned_file(path: str) -> None:
+    """Refuse a file (e.g. planted by another local user) that this user doesn't own."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid():
+        raise PermissionError(f"{path} is not a regular file owned by this user")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+
+
+def open_private_db(path: str) -> sqlite3.Connection:
+    """sqlite3 connection to `path` after ownership checks (the default dir is created 0700)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory == os.path.abspath(CACHE_DIR):
+        ensure_private_dir(directory)
+    check_owned_file(path)
+    old_umask = os.umask(0o077)   # new db / -wal / -shm files: owner only
+    try:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        os.umask(old_umask)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def cache_key(*parts) -> str:
+    """Stable digest of arbitrary JSON-able key parts."""
+    return hashlib.sha256(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteCache:
+    """Host-wide cache in a WAL-mode SQLite file; one connection per thread."""
+
+    EVICT_EVERY = 256   # writes between eviction passes
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key        TEXT PRIMARY KEY,
+                value      BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at);
+            CREATE TABLE IF NOT EXISTS leases (
+                key        TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = open_private_db(self.path)
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at >= ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return _MISSING, 0.0
+        try:
+            return orjson.loads(row[0]), row[1]
+        except orjson.JSONDecodeError:
+            return _MISSING, 0.0
+
+    def set(self, key: str, value, expires_at: float) -> None:
+        blob = orjson.dumps(value)
+        if len(blob) > CACHE_MAX_VALUE_BYTES:
+            return
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, blob, expires_at),
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            # drop whatever would expire soonest
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY expires_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    # --- cross-process single flight ---
+
+    def acquire_lease(self, key: str, owner: str, seconds: float) -> bool:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ?",
+            (key, owner, now + seconds, now),
+        )
+        return cur.rowcount == 1
+
+    def lease_held(self, key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+
+class Cache:
+    """One namespace of the platform cache: L1 in front of the shared L2."""
+
+    LEASE_POLL_INTERVAL = 0.05
+
+    def __init__(self, namespace: str, l2: Optional[SQLiteCache], l1_size: int = CACHE_L1_SIZE):
+        self.namespace = namespace
+        self.l1 = LRUCache(l1_size)
+        self.l2 = l2
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._key_locks_guard = threading.Lock()
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _full_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _lookup(self, key: str):
+        value = self.l1.get(key)
+        if value is not _MISSING or self.l2 is None:
+            return value
+        try:
+            value, expires_at = self.l2.get(key)
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache L2 read failed ({self.namespace}): {e}")
+            return _MISSING
+        if value is not _MISSING:
+            self.l1.set(key, value, min(expires_at, time.time() + CACHE_L1_MAX_TTL))
+        return value
+
+    def get(self, key: str, default=None):
+        value = self._lookup(self._full_key(key))
+        record_cache(self.namespace, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value, ttl: float) -> None:
+        full_key = self._full_key(key)
+        expires_at = time.time() + ttl
+        self.l1.set(full_key, value, min(expires_at, time.time() + CACHE_L1_MAX_TTL))
+        if self.l2 is not None:
+            try:
+                self.l2.set(full_key, value, expires_at)
+            except (sqlite3.Error, TypeError) as e:   # TypeError: value isn't JSON-serializable
+                print(f"⚠️ Cache L2 write failed ({self.namespace}): {e}")
+
+    def delete(self, key: str) -> None:
+        full_key = self._full_key(key)
+        self.l1.delete(full_key)
+        if self.l2 is not None:
+            try:
+                self.l2.delete(full_key)
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache L2 delete failed ({self.namespace}): {e}")
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._key_locks_guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float, lease: float = 30.0):
+        """
+        Return the cached value or compute, store and return it. Exceptions from
+        `compute` propagate and nothing is cached. Waiters give up after `lease`
+        seconds and compute themselves.
+        """
+        full_key = self._full_key(key)
+        value = self._lookup(full_key)
+        if value is not _MISSING:
+            record_cache(self.namespace, True)
+            return value
+
+        lock = self._key_lock(full_key)
+        try:
+            with lock:
+                value = self._lookup(full_key)
+                if value is not _MISSING:
+                    # another thread in this worker filled it while we waited
+                    record_cache(self.namespace, True)
+                    return value
+                record_cache(self.namespace, False)
+                return self._compute_once_across_processes(key, full_key, compute, ttl, lease)
+        finally:
+            with self._key_locks_guard:
+                if not lock.locked():
+                    self._key_locks.pop(full_key, None)
+
+    def _compute_once_across_processes(self, key, full_key, compute, ttl, lease):
+        if self.l2 is None:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+
+        try:
+            leased = self.l2.acquire_lease(full_key, self._owner, lease)
+        except sqlite3.Error:
+            leased = True   # degrade to per-process single flight
+        if not leased:
+            # another worker is computing: wait for its result
+            give_up_at = time.monotonic() + lease
+            while time.monotonic() < give_up_at:
+                time.sleep(self.LEASE_POLL_INTERVAL)
+                value = self._lookup(full_key)
+                if value is not _MISSING:
+                    return value
+                try:
+                    if not self.l2.lease_held(full_key):
+                        break   # owner failed or finished without caching
+                except sqlite3.Error as e:
+                    print(f"⚠️ Cache lease check failed ({self.namespace}), computing locally: {e}")
+                    break
+        try:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if leased:
+                try:
+                    self.l2.release_lease(full_key, self._owner)
+                except sqlite3.Error:
+                    pass
+
+
+_shared_l2: Optional[SQLiteCache] = None
+_caches: dict[str, Cache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_l2() -> Optional[SQLiteCache]:
+    global _shared_l2
+    if _shared_l2 is None and CACHE_DB_PATH:
+        try:
+            _shared_l2 = SQLiteCache(CACHE_DB_PATH, CACHE_MAX_ENTRIES)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Shared cache unavailable at {CACHE_DB_PATH}, using in-process only: {e}")
+            return None
+    return _shared_l2
+
+
+def get_cache(namespace: str) -> Cache:
+    """Process-wide cache for `namespace`; set CACHE_DB_PATH='' to keep it in-process."""
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(namespace)
+            if cache is None:
+                cache = _caches[namespace] = Cache(namespace, _get_l2())
+    return cache
@@ -0,0 +1,68 @@
+# backend/services/deadline.py
+
+import threading
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a run passes its deadline or is cancelled."""
+
+
+class Deadline:
+    """
+    Wall-clock budget for a single agent run.
+
+    Travels through `GenericAgent.run` into every tool via `context["deadline"]`.
+    Tools ask `remaining()` to size their own network timeouts and call
+    `check()` between units of work so a cancelled run unwinds promptly.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self._cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def from_seconds(cls, *candidates) -> "Deadline":
+        """Build from the first positive value (request override, then agent default)."""
+        for value in candidates:
+            try:
+                if value is not None and float(value) > 0:
+                    return cls(float(value))
+            except (TypeError, ValueError):
+                continue
+        return cls(None)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        self.reason = reason
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when the run is unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        if self.cancelled:
+            return True
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, default: float, minimum: float = 1.0) -> float:
+        """Timeout for a single network call: the tool default, capped by the time left."""
+        left = self.remaining()
+        if left is None:
+            return default
+        return max(minimum, min(default, left))
+
+    def check(self, where: str = "") -> None:
+        if self.cancelled:
+            raise DeadlineExceeded(f"Run {self.reason or 'cancelled'}{f' during {where}' if where else ''}")
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded{f' during {where}' if where else ''}")
@@ -0,0 +1,245 @@
+# backend/services/token_budget.py
+"""
+Token accounting and budget-based admission for LLM-heavy runs.
+
+Budgets are sliding one-minute windows, per user and global. They are kept
+in the host-wide SQLite cache file, so every uvicorn worker on the host draws
+from the same windows (with the file disabled or unusable each worker keeps
+its own). A run reserves its *estimated* tokens when admitted and the
+reservation is settled to the real usage reported by the API once the run
+is done.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+
+from .cache import CACHE_DB_PATH, open_private_db
+
+TOKEN_BUDGET_USER_PER_MIN   = int(os.getenv("TOKEN_BUDGET_USER_PER_MIN", "0"))     # 0 = unlimited
+TOKEN_BUDGET_GLOBAL_PER_MIN = int(os.getenv("TOKEN_BUDGET_GLOBAL_PER_MIN", "0"))   # 0 = unlimited
+TOKEN_BUDGET_POLICY         = os.getenv("TOKEN_BUDGET_POLICY", "queue")           # queue | downgrade | reject
+TOKEN_BUDGET_MAX_WAIT       = float(os.getenv("TOKEN_BUDGET_MAX_WAIT", "10"))      # seconds a queued run may wait
+TOKEN_BUDGET_DB_PATH        = os.getenv("TOKEN_BUDGET_DB_PATH", CACHE_DB_PATH)      # '' = per-worker windows
+
+WINDOW_SECONDS = 60.0
+
+ADMIT = "admit"
+DOWNGRADE = "downgrade"
+
+
+class TokenBudgetExceeded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """tiktoken count, falling back to ~4 chars/token if tiktoken is unavailable."""
+    try:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    except ImportError:
+        return math.ceil(len(text) / 4)
+
+
+class TokenUsage:
+    """Per-run accumulator, shared with tools through `context["token_usage"]`."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_tokens = 0
+        self.llm_calls = 0
+        self.decision = ADMIT
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def record(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+            self.llm_calls += 1
+
+
+class _Reservation:
+    __slots__ = ("user_key", "entry", "row_id")
+
+    def __init__(self, user_key, entry: Optional[list] = None, row_id: Optional[int] = None):
+        self.user_key = user_key
+        self.entry = entry     # [timestamp, tokens], shared by the user and global windows (in-process)
+        self.row_id = row_id   # token_budget row (host-wide)
+
+
+class _SharedWindows:
+    """The user/global windows as rows of one SQLite table shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS token_budget (
+                id       INTEGER PRIMARY KEY,
+                user_key TEXT NOT NULL,
+                ts       REAL NOT NULL,
+                tokens   INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_token_budget_ts ON token_budget (ts);
+            CREATE INDEX IF NOT EXISTS ix_token_budget_user_key_ts ON token_budget (user_key, ts);
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = open_private_db(self.path)
+        return conn
+
+    def try_reserve(self, user_key, tokens: int, user_limit: int, global_limit: int):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")   # one reserving worker at a time
+        try:
+            conn.execute("DELETE FROM token_budget WHERE ts < ?", (now - WINDOW_SECONDS,))
+            for limit, where, args in (
+                (user_limit, "user_key = ?", (str(user_key),)),
+                (global_limit, "1 = 1", ()),
+            ):
+                if not limit:
+                    continue
+                used, oldest = conn.execute(
+                    f"SELECT COALESCE(SUM(tokens), 0), MIN(ts) FROM token_budget WHERE {where}", args
+                ).fetchone()
+                if used + tokens > limit:
+                    conn.execute("COMMIT")
+                    return None, max(1.0, oldest + WINDOW_SECONDS - now) if oldest else 1.0
+            cur = conn.execute(
+                "INSERT INTO token_budget (user_key, ts, tokens) VALUES (?, ?, ?)", (str(user_key), now, tokens)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return _Reservation(user_key, row_id=cur.lastrowid), 0.0
+
+    def settle(self, row_id: int, tokens: int) -> None:
+        self._conn().execute("UPDATE token_budget SET tokens = ? WHERE id = ?", (tokens, row_id))
+
+
+class TokenBudget:
+    def __init__(self, user_limit: int, global_limit: int, path: Optional[str] = None):
+        self.user_limit = user_limit
+        self.global_limit = global_limit
+        self._users: dict = {}
+        self._global: deque = deque()
+        self._lock = threading.Lock()
+        self._shared = None
+        if path and self.enabled:
+            try:
+                self._shared = _SharedWindows(path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Host-wide token budget disabled ({path}): {e} - budgets are per worker")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.user_limit or self.global_limit)
+
+    def _used(self, window: deque, now: float) -> int:
+        while window and window[0][0] < now - WINDOW_SECONDS:
+            window.popleft()
+        return sum(tokens for _, tokens in window)
+
+    def _retry_after(self, window: deque, now: float) -> float:
+        return max(1.0, window[0][0] + WINDOW_SECONDS - now) if window else 1.0
+
+    def _try_reserve(self, user_key, tokens: int):
+        """Reserve under the lock; returns (reservation | None, retry_after)."""
+        if self._shared is not None:
+            try:
+                return self._shared.try_reserve(user_key, tokens, self.user_limit, self.global_limit)
+            except sqlite3.Error as e:
+                print(f"⚠️ Host-wide token budget failed, using this worker's windows: {e}")
+        now = time.time()
+        with self._lock:
+            user_window = self._users.setdefault(user_key, deque())
+            if self.user_limit and self._used(user_window, now) + tokens > self.user_limit:
+                return None, self._retry_after(user_window, now)
+            if self.global_limit and self._used(self._global, now) + tokens > self.global_limit:
+                return None, self._retry_after(self._global, now)
+            entry = [now, tokens]
+            user_window.append(entry)
+            self._global.append(entry)
+            return _Reservation(user_key, entry=entry), 0.0
+
+    def fits_ever(self, tokens: int) -> bool:
+        return all(not limit or tokens <= limit for limit in (self.user_limit, self.global_limit))
+
+    def clamp(self, tokens: int) -> int:
+        """`tokens`, capped to the smallest configured limit (a whole window's worth)."""
+        limits = [limit for limit in (self.user_limit, self.global_limit) if limit]
+        return min([tokens] + limits)
+
+    def admit(self, user_key, tokens: int, policy: Optional[str] = None, deadline=None):
+        """
+        Returns (decision, reservation). `decision` is ADMIT, or DOWNGRADE when
+        the caller should switch to a cheaper mode (no tokens reserved).
+        Raises TokenBudgetExceeded when the run is rejected.
+        """
+        if not self.enabled:
+            return ADMIT, None
+        policy = policy or TOKEN_BUDGET_POLICY
+
+        reservation, retry_after = self._try_reserve(user_key, tokens)
+        if reservation:
+            return ADMIT, reservation
+
+        if policy == "queue" and self.fits_ever(tokens):
+            wait_until = time.monotonic() + TOKEN_BUDGET_MAX_WAIT
+            if deadline is not None and deadline.remaining() is not None:
+                wait_until = min(wait_until, time.monotonic() + deadline.remaining())
+            while time.monotonic() + min(retry_after, 1.0) < wait_until:
+                time.sleep(min(retry_after, 1.0))
+                if deadline is not None:
+                    deadline.check("token budget queue")
+                reservation, retry_after = self._try_reserve(user_key, tokens)
+                if reservation:
+                    return ADMIT, reservation
+
+        if policy == "downgrade":
+            return DOWNGRADE, None
+
+        raise TokenBudgetExceeded(
+            f"Token budget exhausted: run needs ~{tokens} tokens", retry_after=retry_after
+        )
+
+    def settle(self, reservation: Optional[_Reservation], actual_tokens: int) -> None:
+        """Replace the estimate with what the run really used."""
+        if reservation is None:
+            return
+        if reservation.row_id is not None:
+            try:
+                self._shared.settle(reservation.row_id, actual_tokens)
+            except sqlite3.Error as e:
+                print(f"⚠️ Token budget settle failed: {e}")
+            return
+        with self._lock:
+            reservation.entry[1] = actual_tokens
+
+
+BUDGET = TokenBudget(TOKEN_BUDGET_USER_PER_MIN, TOKEN_BUDGET_GLOBAL_PER_MIN, TOKEN_BUDGET_DB_PATH)
@@ -0,0 +1,119 @@
+# backend/services/uploads.py
+"""
+Multipart uploads for run endpoints, without buffering whole files.
+
+The request body is counted as it streams in and rejected with 413 as soon as
+it passes UPLOAD_MAX_BYTES. Starlette spools each file to disk once it grows
+past UPLOAD_SPOOL_BYTES; tools then get a read-only memory map of the spooled
+file (small in-memory files are handed over as-is), never a bytes copy.
+"""
+import io
+import mmap
+import os
+from contextlib import aclosing
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartParser
+
+UPLOAD_MAX_BYTES   = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+
+class UploadParser(MultiPartParser):
+    # Starlette's spooling threshold is a class attribute: set it here, not on MultiPartParser
+    spool_max_size = UPLOAD_SPOOL_BYTES
+
+
+async def parse_upload_form(request: Request, max_bytes: int = UPLOAD_MAX_BYTES) -> FormData:
+    """Parse a multipart body, failing fast once it exceeds `max_bytes`."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    received = 0
+    receive = request.receive
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(413, detail=f"Upload exceeds {max_bytes} bytes")
+        return message
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != "multipart/form-data":
+        return FormData()   # the endpoint reports the missing fields
+    limited = Request(request.scope, limited_receive)
+    try:
+        async with aclosing(limited.stream()) as stream:
+            return await UploadParser(request.headers, stream, max_files=1, max_fields=10).parse()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(400, detail=f"Invalid multipart body: {e}")
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only, seekable file object over an mmap (a bare mmap has no `seekable()`, which zipfile needs)."""
+
+    def __init__(self, mapped: mmap.mmap):
+        super().__init__()
+        self._mmap = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._mmap.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._mmap.read(-1 if size is None else size)
+
+    def readall(self) -> bytes:
+        return self._mmap.read()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._mmap.seek(offset, whence)
+        return self._mmap.tell()
+
+    def tell(self) -> int:
+        return self._mmap.tell()
+
+
+class UploadedDocument:
+    """What tools receive: `.filename` plus a seekable `.file` (mapped spool file or in-memory buffer)."""
+
+    def __init__(self, upload: UploadFile):
+        self.filename = upload.filename or "Uploaded File"
+        self.content_type = upload.content_type
+        self._upload = upload
+        self._mmap = None
+
+        spooled = upload.file
+        spooled.seek(0, os.SEEK_END)
+        self.size = spooled.tell()
+        spooled.seek(0)
+
+        # rolled-over spool files have a real fd we can map; small ones stay in memory
+        if getattr(spooled, "_rolled", True) and self.size:
+            self._mmap = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+            self.file = MappedFile(self._mmap)
+        else:
+            self.file = spooled
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self.file.close()
+            self._mmap.close()
+            self._mmap = None
+
+    def __repr__(self) -> str:
+        return f"<UploadedDocument {self.filename!r} ({self.size} bytes)>"
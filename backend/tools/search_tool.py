@@ -1,10 +1,28 @@
-import os, requests
+import os, time, requests
 from ..schemas import WebSearchOutput, WebSearchResult
+from ..services.cache import cache_key, get_cache
+from ..tracing.metrics import SEARCH_CALLS, SEARCH_LATENCY
+
+def _as_text(value) -> str:
+    """SerpAPI field as a string: missing -> "", lists (e.g. split snippets) joined, anything else str()."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return " ".join(_as_text(v) for v in value)
+    return str(value)
+
 
 class WebSearchTool:
+    REQUEST_TIMEOUT = 15  # seconds, capped by the run deadline
+    CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "600"))  # 0 disables
+
     def __init__(self, engine: str = "serpapi"):
         self.engine = engine
         self.api_key = os.getenv("SERPAPI_KEY")
+        # pooled connections, reused when one instance serves many runs
+        self.session = requests.Session()
 
     def run(self, query: str, context: dict = None, config: dict = None) -> WebSearchOutput:
         eng = (config or {}).get("engine", self.engine)
@@ -18,20 +36,68 @@ class WebSearchTool:
                 )
             ])
 
-        resp = requests.get(
-            "https://serpapi.com/search",
-            params={"q": query, "api_key": self.api_key, "engine": "google", "num": 10},
-        ).json()
+        deadline = (context or {}).get("deadline")
+        timeout = self.REQUEST_TIMEOUT
+        if deadline is not None:
+            deadline.check("web search")
+            timeout = deadline.timeout(self.REQUEST_TIMEOUT)
+
+        ttl = (config or {}).get("cache_ttl", self.CACHE_TTL)
+        if not ttl:
+            return self._search(query, eng, timeout)
+        # identical queries from any worker on this host share one SerpAPI call
+        cached = get_cache("web_search").get_or_compute(
+            cache_key(eng, query, 10),
+            lambda: self._search(query, eng, timeout).model_dump(),
+            ttl=ttl,
+            lease=timeout,
+        )
+        return self._from_cached(cached)
+
+    @staticmethod
+    def _from_cached(data: dict) -> WebSearchOutput:
+        # the cache holds plain JSON; entries were built by _search, so no revalidation
+        return WebSearchOutput.model_construct(
+            query=data["query"],
+            results=[WebSearchResult.model_construct(**r) for r in data["results"]],
+        )
+
+    def run_stream(self, query: str, context: dict = None, config: dict = None):
+        """Streaming contract: yield results one by one so a consuming step can start on the first."""
+        yield from self.run(query, context, config).results
+
+    def assemble(self, results: list, query: str, config: dict = None) -> WebSearchOutput:
+        """Rebuild the regular output from the streamed results (for steps reading it from context)."""
+        return WebSearchOutput.model_construct(query=query, results=results)
+
+    def _search(self, query: str, eng: str, timeout: float) -> WebSearchOutput:
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(
+                "https://serpapi.com/search",
+                params={"q": query, "api_key": self.api_key, "engine": "google", "num": 10},
+                timeout=timeout,
+            ).json()
+        except Exception:
+            SEARCH_CALLS.labels(engine=eng, outcome="error").inc()
+            raise
+        finally:
+            SEARCH_LATENCY.labels(engine=eng).observe(time.perf_counter() - start)
+        SEARCH_CALLS.labels(engine=eng, outcome="ok").inc()
 
         results = []
         for item in resp.get("organic_results", []):
-            result = WebSearchResult(
+            if not isinstance(item, dict):
+                continue
+            # fields are coerced here, so model_construct can skip pydantic validation
+            position = item.get("position")
+            result = WebSearchResult.model_construct(
                 type="article",
-                title=item.get("title", "No Title"),
-                snippet=item.get("snippet", ""),
-                link=item.get("link", ""),
-                extra={"position": item.get("position", None)}
+                title=_as_text(item.get("title")) or "No Title",
+                snippet=_as_text(item.get("snippet")),
+                link=_as_text(item.get("link")),
+                extra={"position": position if isinstance(position, int) and not isinstance(position, bool) else None}
             )
             results.append(result)
 
-        return WebSearchOutput(query=query, results=results)
+        return WebSearchOutput.model_construct(query=query, results=results)
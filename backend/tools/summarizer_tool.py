@@ -1,20 +1,66 @@
 # backend/tools/summarizer_tool.py
 
+import io
 import os
+import math
+import codecs
+import time
 import mimetypes
-import openai
-import PyPDF2
-from newspaper import Article
-from docx import Document
 from dotenv import load_dotenv
 from typing import List, Dict, Union, Tuple
 from backend.schemas import WebSearchOutput, WebSearchResult
+from backend.services.deadline import DeadlineExceeded
+from backend.services.article_cache import get_article_fetcher
+from backend.services.cache import cache_key, get_cache
+from backend.services.token_budget import BUDGET, DOWNGRADE, TokenUsage, count_tokens
+from backend.tracing.metrics import LLM_CALLS, LLM_LATENCY
+from backend.utils.streams import background
+from backend.utils.textrank import extractive_summary
 
 load_dotenv()
 
+# openai, PyPDF2, newspaper (nltk + lxml) and docx are imported on first use:
+# they cost seconds at startup and most workers only ever touch a subset.
+
+
+MODES = ("abstractive", "extractive", "hybrid")
+
+
+class _RunState:
+    """Per-run state threaded through the summarization helpers (tool instances are shared)."""
+    __slots__ = ("deadline", "usage", "mode", "routes", "routing")
+
+    def __init__(self, deadline=None, usage: TokenUsage = None, mode: str = "abstractive", routes: dict = None):
+        self.deadline = deadline
+        self.usage = usage if usage is not None else TokenUsage()
+        self.mode = mode
+        self.routes = routes      # step config "routing": {role: [route, ...]}
+        self.routing = []         # decisions taken, reported in summarizer_details
+
+
 class SummarizerTool:
+    LLM_MODEL = "gpt-3.5-turbo-16k"
+    # Per call role ("map" = chunk/source, "reduce" = chunk consolidation, "final" =
+    # cross-source merge) a step may configure routes in config["routing"]; each
+    # route is {"max_input_tokens": int | None, "models": [fallback chain],
+    # "timeout": seconds, "max_tokens": int}. These apply to every role otherwise.
+    DEFAULT_ROUTES = [
+        {"max_input_tokens": 3000, "models": ["gpt-4o-mini", "gpt-3.5-turbo-16k"]},
+        {"max_input_tokens": None, "models": ["gpt-3.5-turbo-16k", "gpt-4o-mini"]},
+    ]
     CHAR_CHUNK_SIZE = 12000
     SUMMARY_RATIO = 0.5
+    ARTICLE_TIMEOUT = 10  # seconds per article download, capped by the run deadline
+    LLM_TIMEOUT = 120     # seconds per completion, capped by the run deadline
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))  # 0 disables
+    LLM_MAX_TOKENS = 2000
+    EXPECTED_COMPLETION_TOKENS = 600  # per call, for pre-run estimates
+    HYBRID_MAX_CHARS = 6000           # extract sent to the LLM per source in hybrid mode
+    HYBRID_MIN_LLM_CHARS = 2000       # hybrid inputs shorter than this never reach the LLM
+    READ_CHUNK_BYTES = 1024 * 1024    # text files are decoded incrementally in blocks of this size
+    FETCH_AHEAD = 2                   # streamed articles fetched ahead of the one being summarized
+    STREAM_EXPECTED_SOURCES = 10      # reserved for up front when streaming (web_search asks for 10 results)
+    CHARS_PER_TOKEN = 4               # for estimates of text not seen yet
 
     def __init__(self, prompt: str = None):
         self.default_prompt = prompt or (
@@ -24,48 +70,198 @@ class SummarizerTool:
             "while preserving the original meaning and context. Format with clear paragraphs "
             "where appropriate."
         )
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._client = None
+
+    @classmethod
+    def warm_up(cls) -> None:
+        """Pre-import heavy dependencies so the first request doesn't pay for them."""
+        import openai, PyPDF2, newspaper, docx, tiktoken, numpy, zstandard  # noqa: F401
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
 
     def run(self, input_data, context: dict = None, config: dict = None) -> str:
         print("🟡 SummarizerTool invoked")
         prompt = (config or {}).get("prompt", self.default_prompt)
         include_details = (config or {}).get("include_details", True)
+        deadline = (context or {}).get("deadline")
+        allow_partial = (context or {}).get("allow_partial", False)
+        mode = (config or {}).get("mode", "abstractive")
+        if mode not in MODES:
+            raise ValueError(f"Unknown summarizer mode '{mode}'. Expected one of {list(MODES)}")
+        state = _RunState(deadline, (context or {}).get("token_usage"), mode, (config or {}).get("routing"))
 
         # 1) Gather text with source information
-        source_data = self._gather_text(input_data)
+        source_data = self._gather_text(input_data, deadline)
         if not source_data:
             return "⚠️ No content to summarize"
 
-        # 2) Calculate target summary length
+        # 1a) Short inputs are summarized locally; hybrid pre-extracts what the LLM sees
         total_chars = sum(len(text) for _, text in source_data)
-        target_final_length = max(100, min(2000, int(total_chars * self.SUMMARY_RATIO / 10)))
+        default_threshold = self.HYBRID_MIN_LLM_CHARS if mode == "hybrid" else 0
+        if total_chars < (config or {}).get("min_llm_chars", default_threshold):
+            print(f"⚡ {total_chars} chars below LLM threshold - extractive summary")
+            state.mode = "extractive"
+        elif mode == "hybrid":
+            source_data = self._reduce(source_data, (config or {}).get("hybrid_max_chars", self.HYBRID_MAX_CHARS))
+
+        if state.mode == "extractive":
+            return self._summarize_sources(prompt, source_data, state, context, allow_partial)
+
+        # 1b) Estimate the run's tokens and pass budget admission before any LLM call
+        source_data, reservation = self._admit(
+            prompt, source_data, state, (context or {}).get("user_id"), (config or {}).get("budget_policy")
+        )
+        tokens_before = state.usage.total_tokens
+        try:
+            return self._summarize_sources(prompt, source_data, state, context, allow_partial)
+        finally:
+            BUDGET.settle(reservation, state.usage.total_tokens - tokens_before)
+
+    def run_from_stream(self, items, context: dict = None, config: dict = None) -> str:
+        """
+        Streaming contract (workflows with "streaming": true): summarize sources
+        as the upstream step yields them. Articles are fetched FETCH_AHEAD
+        results ahead of the LLM calls. The run passes token-budget admission
+        once, before the first source, for a conservative estimate (config
+        "expected_sources" sources of CHAR_CHUNK_SIZE chars, capped at the
+        per-minute limit); the reservation is settled down to actual use
+        plus the remaining sources' share as they arrive, so a run is never
+        rejected halfway through.
+        """
+        print("🟡 SummarizerTool invoked (streaming)")
+        config = config or {}
+        prompt = config.get("prompt", self.default_prompt)
+        deadline = (context or {}).get("deadline")
+        allow_partial = (context or {}).get("allow_partial", False)
+        mode = config.get("mode", "abstractive")
+        if mode not in MODES:
+            raise ValueError(f"Unknown summarizer mode '{mode}'. Expected one of {list(MODES)}")
+        state = _RunState(deadline, (context or {}).get("token_usage"), mode, config.get("routing"))
+        threshold = config.get("min_llm_chars", self.HYBRID_MIN_LLM_CHARS if mode == "hybrid" else 0)
+        hybrid_max = config.get("hybrid_max_chars", self.HYBRID_MAX_CHARS)
+        user_id, policy = (context or {}).get("user_id"), config.get("budget_policy")
 
-        # 3) Process each source
+        source_summaries = []
+        pending = []        # held back until the input is known to reach the LLM threshold
+        seen_chars = 0      # raw input so far, for the threshold
+        total_chars = 0     # what was actually summarized, for the final length
+        use_llm = mode != "extractive" and not threshold
+        expected_sources = max(1, int(config.get("expected_sources", self.STREAM_EXPECTED_SOURCES)))
+        tokens_before = state.usage.total_tokens
+        reservation, per_source = None, 0
+
+        if mode != "extractive":
+            # 1) Admit the whole run before anything is fetched or sent to the LLM
+            reservation, per_source, hybrid_max = self._admit_stream(
+                prompt, expected_sources, hybrid_max, state, user_id, policy
+            )
+
+        def process(source: str, text: str) -> None:
+            nonlocal total_chars
+            data = [(source, text)]
+            if state.mode == "hybrid":
+                data = self._reduce(data, hybrid_max)
+            total_chars += len(data[0][1])
+            source_summaries.append(self._summarize_source(prompt, data[0][0], data[0][1], state))
+            if reservation is not None:
+                # keep holding the estimate for sources still to come (plus the final merge)
+                remaining = max(0, expected_sources - len(source_summaries)) * per_source + per_source
+                BUDGET.settle(reservation, state.usage.total_tokens - tokens_before + remaining)
+
+        sources = background(lambda: self._iter_sources(items, deadline), self.FETCH_AHEAD, deadline, name="fetch")
+        try:
+            try:
+                for source, text in sources:
+                    if not text.strip():
+                        continue
+                    seen_chars += len(text)
+                    if use_llm or state.mode == "extractive":
+                        process(source, text)
+                        continue
+                    pending.append((source, text))
+                    if seen_chars >= threshold:
+                        use_llm = True
+                        for held in pending:
+                            process(*held)
+                        pending.clear()
+
+                if pending:
+                    # the whole input stayed below the threshold
+                    print(f"⚡ {seen_chars} chars below LLM threshold - extractive summary")
+                    state.mode = "extractive"
+                    for held in pending:
+                        process(*held)
+            except DeadlineExceeded:
+                if allow_partial and source_summaries:
+                    print(f"⏱️ Deadline reached - returning {len(source_summaries)} source summaries")
+                else:
+                    raise
+
+            if not source_summaries and not seen_chars:
+                return "⚠️ No content to summarize"
+            return self._combine(prompt, source_summaries, total_chars, state, context)
+        finally:
+            sources.close(timeout=0)
+            BUDGET.settle(reservation, state.usage.total_tokens - tokens_before)
+
+    def _summarize_sources(self, prompt: str, source_data, state: _RunState, context, allow_partial: bool) -> str:
+        # 2) Process each source
         source_summaries = []
         for source, text in source_data:
             if not text.strip():
                 continue
-                
-            # Calculate source target length proportional to its content size
-            source_target = max(50, min(800, int(len(text) * self.SUMMARY_RATIO / 10)))
-            source_prompt = f"{prompt} Keep the summary to approximately {source_target} words."
-            
-            print(f"📑 Processing source: {source or 'Unknown'} ({len(text)} chars)")
-            source_result = self._summarize_text(source_prompt, text)
-            source_summaries.append({
-                "source": source,
-                "original_length": len(text),
-                "summary": source_result,
-                "summary_length": len(source_result.split())
-            })
-
-        # 4) Create final summary
+            try:
+                source_summaries.append(self._summarize_source(prompt, source, text, state))
+            except DeadlineExceeded:
+                if allow_partial and source_summaries:
+                    print(f"⏱️ Deadline reached - returning {len(source_summaries)} source summaries")
+                    break
+                raise
+
+        # 3) Create final summary
+        total_chars = sum(len(text) for _, text in source_data)
+        return self._combine(prompt, source_summaries, total_chars, state, context)
+
+    def _summarize_source(self, prompt: str, source: str, text: str, state: _RunState) -> dict:
+        # Calculate source target length proportional to its content size
+        source_target = max(50, min(800, int(len(text) * self.SUMMARY_RATIO / 10)))
+        source_prompt = f"{prompt} Keep the summary to approximately {source_target} words."
+
+        print(f"📑 Processing source: {source or 'Unknown'} ({len(text)} chars)")
+        if state.mode == "extractive":
+            source_result = extractive_summary(text, max_words=source_target)
+        else:
+            source_result = self._summarize_text(source_prompt, text, state)
+        return {
+            "source": source,
+            "original_length": len(text),
+            "summary": source_result,
+            "summary_length": len(source_result.split())
+        }
+
+    def _combine(self, prompt: str, source_summaries: List[dict], total_chars: int, state: _RunState, context) -> str:
+        deadline = state.deadline
+        # target summary length follows the size of the (possibly reduced) input
+        target_final_length = max(100, min(2000, int(total_chars * self.SUMMARY_RATIO / 10)))
+
         if not source_summaries:
             return "⚠️ No valid content processed"
 
         if len(source_summaries) == 1:
             print("✅ Single source - using as final summary")
             final_summary = source_summaries[0]["summary"]
+        elif state.mode == "extractive":
+            final_summary = extractive_summary(
+                "\n\n".join(s["summary"] for s in source_summaries), max_words=target_final_length
+            )
+        elif deadline is not None and deadline.expired():
+            # no time left for a consolidation call; hand back what we have
+            final_summary = "\n\n".join(s["summary"] for s in source_summaries)
         else:
             print(f"🔄 Combining {len(source_summaries)} source summaries")
             combined_text = "\n\n".join([f"Source: {s['source']}\nSummary: {s['summary']}" for s in source_summaries])
@@ -74,7 +270,7 @@ class SummarizerTool:
                 f"a comprehensive overview. Keep the final summary to approximately "
                 f"{target_final_length} words."
             )
-            final_summary = self._summarize_text(final_prompt, combined_text)
+            final_summary = self._summarize_text(final_prompt, combined_text, state, role="final")
 
         print(f"✅ Summarization complete. Final summary: {len(final_summary.split())} words")
         
@@ -82,27 +278,90 @@ class SummarizerTool:
         if context is not None:
             context["summarizer_details"] = {
                 "final_summary": final_summary,
-                "source_summaries": source_summaries
+                "source_summaries": source_summaries,
+                "mode": state.mode,
+                "routing": state.routing,
             }
 
         return final_summary
 
-    def _gather_text(self, input_data) -> List[Tuple[str, str]]:
+    def _estimate_tokens(self, prompt: str, source_data: List[Tuple[str, str]]) -> int:
+        """Upper-bound style estimate of prompt + completion tokens for the whole run."""
+        prompt_tokens = count_tokens(prompt, self.LLM_MODEL)
+        expected = self.EXPECTED_COMPLETION_TOKENS
+        total = 0
+        for _, text in source_data:
+            calls = max(1, math.ceil(len(text) / self.CHAR_CHUNK_SIZE))
+            total += count_tokens(text, self.LLM_MODEL) + calls * (prompt_tokens + expected)
+            if calls > 1:
+                total += calls * expected + expected       # consolidation call
+        if len(source_data) > 1:
+            total += len(source_data) * expected + expected  # final merge
+        return total
+
+    def _reduce(self, source_data: List[Tuple[str, str]], max_chars: int) -> List[Tuple[str, str]]:
+        """Replace long sources by their top-ranked sentences so the LLM sees at most `max_chars` each."""
+        reduced = []
+        for source, text in source_data:
+            if len(text) > max_chars:
+                extract = extractive_summary(text, max_chars=max_chars)
+                print(f"✂️ Extracted {len(extract)}/{len(text)} chars from {source}")
+                text = extract
+            reduced.append((source, text))
+        return reduced
+
+    def _admit(self, prompt, source_data, state: _RunState, user_id, policy):
+        estimate = self._estimate_tokens(prompt, source_data)
+        decision, reservation = BUDGET.admit(user_id, estimate, policy=policy, deadline=state.deadline)
+        if decision == DOWNGRADE:
+            # cheaper mode: hybrid with a tighter extract, one LLM call per source
+            source_data = self._reduce(source_data, self.HYBRID_MAX_CHARS // 2)
+            state.mode = "hybrid"
+            estimate = self._estimate_tokens(prompt, source_data)
+            print(f"⬇️ Token budget tight - downgraded to hybrid, ~{estimate} tokens")
+            _, reservation = BUDGET.admit(user_id, estimate, policy="reject", deadline=state.deadline)
+        state.usage.estimated_tokens += estimate
+        state.usage.decision = decision
+        return source_data, reservation
+
+    def _admit_stream(self, prompt, expected_sources: int, hybrid_max: int, state: _RunState, user_id, policy):
+        """Whole-run admission for a stream: (reservation, tokens per source, hybrid extract size)."""
+        def per_source(chars: int) -> int:
+            # one source of `chars` unseen chars, plus its share of the final merge
+            return self._estimate_tokens(prompt, [("", "")]) + chars // self.CHARS_PER_TOKEN + self.EXPECTED_COMPLETION_TOKENS
+
+        chars = min(hybrid_max, self.CHAR_CHUNK_SIZE) if state.mode == "hybrid" else self.CHAR_CHUNK_SIZE
+        # the upper bound may exceed a small per-minute limit outright; holding the whole
+        # window is as conservative as admission can get, the settles track real use
+        estimate = BUDGET.clamp((expected_sources + 1) * per_source(chars))
+        decision, reservation = BUDGET.admit(user_id, estimate, policy=policy, deadline=state.deadline)
+        if decision == DOWNGRADE:
+            # cheaper mode: hybrid with a tighter extract, one LLM call per source
+            state.mode = "hybrid"
+            hybrid_max = min(hybrid_max, self.HYBRID_MAX_CHARS // 2)
+            chars = hybrid_max
+            estimate = BUDGET.clamp((expected_sources + 1) * per_source(chars))
+            print(f"⬇️ Token budget tight - downgraded to hybrid, ~{estimate} tokens")
+            _, reservation = BUDGET.admit(user_id, estimate, policy="reject", deadline=state.deadline)
+        state.usage.estimated_tokens += estimate
+        state.usage.decision = decision
+        return reservation, per_source(chars), hybrid_max
+
+    def _gather_text(self, input_data, deadline=None) -> List[Tuple[str, str]]:
         """Extract raw text with source information."""
         sources = []
 
         # WebSearchOutput - process each URL separately
         if isinstance(input_data, WebSearchOutput):
+            fetcher = get_article_fetcher()
             print(f"🟢 Detected {len(input_data.results)} web results")
             for res in input_data.results:
-                try:
-                    art = Article(res.link)
-                    art.download()
-                    art.parse()
-                    sources.append((res.link, f"Title: {art.title}\n{art.text}"))
-                    print(f"   ✔️  Fetched: {res.link} ({len(art.text)} chars)")
-                except Exception as e:
-                    print(f"   ❌ Failed to fetch {res.link}: {str(e)[:70]}")
+                if deadline is not None and deadline.expired():
+                    print(f"   ⏱️ Deadline reached - skipping remaining results")
+                    break
+                fetched = self._fetch_result(fetcher, res, deadline)
+                if fetched:
+                    sources.append(fetched)
 
         # Single string input
         elif isinstance(input_data, str):
@@ -123,10 +382,38 @@ class SummarizerTool:
 
         return sources
 
-    def _summarize_text(self, prompt: str, text: str) -> str:
+    def _fetch_result(self, fetcher, res: WebSearchResult, deadline=None):
+        """(link, text) for one search result, or None when it can't be fetched."""
+        timeout = self.ARTICLE_TIMEOUT
+        if deadline is not None:
+            timeout = deadline.timeout(self.ARTICLE_TIMEOUT)
+        try:
+            title, text, status = fetcher.fetch(res.link, timeout)
+            print(f"   ✔️  Fetched: {res.link} ({len(text)} chars, {status})")
+            return res.link, f"Title: {title}\n{text}"
+        except Exception as e:
+            print(f"   ❌ Failed to fetch {res.link}: {str(e)[:70]}")
+            return None
+
+    def _iter_sources(self, items, deadline=None):
+        """Streamed step input (search results, texts, documents) → (source, text), fetching lazily."""
+        fetcher = None
+        for item in items:
+            if deadline is not None and deadline.expired():
+                print(f"   ⏱️ Deadline reached - skipping remaining stream items")
+                return
+            if isinstance(item, WebSearchResult):
+                fetcher = fetcher or get_article_fetcher()
+                fetched = self._fetch_result(fetcher, item, deadline)
+                if fetched:
+                    yield fetched
+            else:
+                yield from self._gather_text(item, deadline)
+
+    def _summarize_text(self, prompt: str, text: str, state: _RunState, role: str = "map") -> str:
         """Handle chunking and summarization for a text block"""
         if len(text) <= self.CHAR_CHUNK_SIZE:
-            return self._call_llm(prompt, text)
+            return self._call_llm(prompt, text, state, role)
 
         chunks = self._chunk_text(text)
         print(f"📑 Splitting into {len(chunks)} chunks for summarization")
@@ -134,7 +421,7 @@ class SummarizerTool:
         chunk_summaries = []
         for i, chunk in enumerate(chunks, 1):
             print(f"  ✳️ Summarizing chunk {i}/{len(chunks)} ({len(chunk)} chars)")
-            chunk_summaries.append(self._call_llm(prompt, chunk))
+            chunk_summaries.append(self._call_llm(prompt, chunk, state, "map"))
         
         if len(chunk_summaries) == 1:
             return chunk_summaries[0]
@@ -145,7 +432,7 @@ class SummarizerTool:
             "Maintain all critical information while eliminating redundancies. "
             "Ensure smooth transitions between sections."
         )
-        return self._call_llm(consolidation_prompt, combined)
+        return self._call_llm(consolidation_prompt, combined, state, "final" if role == "final" else "reduce")
 
     def _chunk_text(self, text: str) -> List[str]:
         """Split text preserving paragraph boundaries"""
@@ -170,51 +457,134 @@ class SummarizerTool:
             
         return chunks
 
-    def _call_llm(self, prompt: str, text: str) -> str:
-        """Handle LLM communication with error management"""
+    def _route(self, role: str, input_tokens: int, routing: dict | None) -> dict:
+        """First route for `role` whose max_input_tokens fits the input; the last route is the catch-all."""
+        routes = (routing or {}).get(role) or self.DEFAULT_ROUTES
+        for route in routes:
+            limit = route.get("max_input_tokens")
+            if limit is None or input_tokens <= limit:
+                return route
+        return routes[-1]
+
+    def _call_llm(self, prompt: str, text: str, state: _RunState, role: str = "map") -> str:
+        """Route to a model by role and input size, falling back down the chain on errors/timeouts."""
+        deadline = state.deadline
+        input_tokens = count_tokens(prompt, self.LLM_MODEL) + count_tokens(text, self.LLM_MODEL)
+        route = self._route(role, input_tokens, state.routes)
+        max_tokens = route.get("max_tokens", self.LLM_MAX_TOKENS)
+
+        error = None
+        for model in route.get("models") or [self.LLM_MODEL]:
+            client = self.client
+            timeout = route.get("timeout", self.LLM_TIMEOUT)
+            if deadline is not None:
+                deadline.check("summarization")
+                timeout = deadline.timeout(timeout)
+            if deadline is not None or "timeout" in route:
+                # retries would silently blow through the deadline / delay the fallback
+                client = client.with_options(timeout=timeout, max_retries=0)
+
+            start = time.perf_counter()
+            try:
+                if not self.LLM_CACHE_TTL:
+                    summary = self._complete(client, model, max_tokens, prompt, text, state.usage)
+                else:
+                    # repeated chunks (same article across runs/workers) reuse the completion;
+                    # failures raise out of _complete and are never cached
+                    summary = get_cache("llm").get_or_compute(
+                        cache_key(model, max_tokens, prompt, text),
+                        lambda: self._complete(client, model, max_tokens, prompt, text, state.usage),
+                        ttl=self.LLM_CACHE_TTL,
+                        lease=timeout,
+                    )
+                state.routing.append(self._route_record(role, input_tokens, model, "ok", start))
+                return summary
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error = e
+                state.routing.append(self._route_record(role, input_tokens, model, "error", start, e))
+                print(f"⚠️ LLM error on {model}: {str(e)[:100]}")
+
+        if deadline is not None:
+            deadline.check("summarization")
+        return f"⚠️ Summarization failed: {str(error)[:70]}"
+
+    @staticmethod
+    def _route_record(role: str, input_tokens: int, model: str, outcome: str, start: float, error=None) -> dict:
+        record = {
+            "role": role,
+            "input_tokens": input_tokens,
+            "model": model,
+            "outcome": outcome,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if error is not None:
+            record["error"] = str(error)[:100]
+        return record
+
+    def _complete(self, client, model: str, max_tokens: int, prompt: str, text: str, usage: TokenUsage) -> str:
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-16k",
+            response = client.chat.completions.create(
+                model=model,
                 messages=[
                     {"role": "system", "content": prompt},
                     {"role": "user", "content": text},
                 ],
                 temperature=0.3,
-                max_tokens=2000,
+                max_tokens=max_tokens,
             )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"⚠️ LLM error: {str(e)[:100]}")
-            return f"⚠️ Summarization failed: {str(e)[:70]}"
+        except Exception:
+            LLM_CALLS.labels(model=model, outcome="error").inc()
+            raise
+        finally:
+            LLM_LATENCY.labels(model=model).observe(time.perf_counter() - start)
+        LLM_CALLS.labels(model=model, outcome="ok").inc()
+        if response.usage is not None:
+            usage.record(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content.strip()
 
     def _extract_text_from_file(self, file) -> Tuple[str, str]:
         """Extract text from various file formats with source info"""
         # Handle different file types
         stream = getattr(file, "file", file)
+        if isinstance(stream, (bytes, bytearray)):
+            stream = io.BytesIO(stream)
         name = getattr(file, "filename", "Uploaded File")
         mime, _ = mimetypes.guess_type(name or "")
 
         try:
             if mime == "application/pdf":
+                import PyPDF2
                 reader = PyPDF2.PdfReader(stream)
                 text = "\n".join(p.extract_text() or "" for p in reader.pages)
                 return text, f"PDF: {name}"
 
             elif mime == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+                from docx import Document
                 doc = Document(stream)
                 text = "\n".join(p.text for p in doc.paragraphs)
                 return text, f"DOCX: {name}"
 
             elif mime in ["text/plain", "text/markdown", "text/csv"]:
-                stream.seek(0)
-                return stream.read().decode("utf-8", errors="ignore"), f"Text: {name}"
+                return self._decode_stream(stream), f"Text: {name}"
 
             else:
-                stream.seek(0)
-                raw = stream.read()
-                if isinstance(raw, (bytes, bytearray)):
-                    return raw.decode("utf-8", errors="ignore"), f"File: {name}"
-                return str(raw), f"File: {name}"
+                return self._decode_stream(stream), f"File: {name}"
 
         except Exception as e:
-            raise RuntimeError(f"File processing error ({name}): {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"File processing error ({name}): {str(e)}")
+
+    def _decode_stream(self, stream) -> str:
+        """Decode UTF-8 block by block instead of reading the whole file into one bytes object."""
+        stream.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        parts = []
+        while True:
+            block = stream.read(self.READ_CHUNK_BYTES)
+            if not block:
+                break
+            parts.append(block if isinstance(block, str) else decoder.decode(block))
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
@@ -0,0 +1,212 @@
+# backend/tracing/profiler.py
+"""
+Opt-in sampling profiler for single agent runs.
+
+A profiled run gets a sampler thread that snapshots the worker thread's stack
+every PROFILE_INTERVAL seconds and folds it into collapsed-stack counts (the
+input format of flamegraph.pl / speedscope), prefixed with the workflow step
+active at the time. GenericAgent also reports per-step wall and CPU time.
+When no run is profiled the only cost is one thread-local lookup per run.
+
+Reports are written to a private directory shared by every worker on the
+host, so any worker can serve `GET /admin/profiles/{id}`.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from ..services.cache import CACHE_DIR, ensure_private_dir
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))     # fraction of runs
+PROFILE_INTERVAL    = float(os.getenv("PROFILE_INTERVAL", "0.005"))    # seconds between samples
+PROFILE_MAX_REPORTS = int(os.getenv("PROFILE_MAX_REPORTS", "50"))      # kept on disk, oldest pruned
+PROFILE_DIR         = os.getenv("PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))  # '' = this worker's memory only
+
+_local = threading.local()
+
+
+def current() -> Optional["ProfileSession"]:
+    """The session profiling this thread's run, if any."""
+    return getattr(_local, "session", None)
+
+
+def should_profile(requested: bool) -> bool:
+    """`requested` is an authorized per-request opt-in; otherwise sample at the configured rate."""
+    return requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+class ProfileSession:
+    def __init__(self, meta: dict):
+        self.id = uuid.uuid4().hex[:16]
+        self.meta = meta
+        self.samples: Counter = Counter()
+        self.steps: list[dict] = []
+        self.current_step = "setup"
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+        self._step_started = (0.0, 0.0)
+
+    # --- sampling ---
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(f"step:{self.current_step}")
+            self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        # sessions are created on the event loop but sample the worker thread
+        self._thread_id = threading.get_ident()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self._stop.set()
+        self._sampler.join()
+
+    # --- step attribution (called by GenericAgent on the profiled thread) ---
+
+    def begin_step(self, name: str) -> None:
+        self.current_step = name
+        self._step_started = (time.perf_counter(), time.thread_time())
+
+    def end_step(self, name: str, outcome: str) -> None:
+        wall_start, cpu_start = self._step_started
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        self.steps.append({
+            "tool": name,
+            "outcome": outcome,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "wait_seconds": round(max(0.0, wall - cpu), 6),   # network / IO / locks
+        })
+        self.current_step = "between_steps"
+
+    def report(self) -> dict:
+        return {
+            "id": self.id,
+            "created_at": time.time(),
+            "meta": self.meta,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "interval": PROFILE_INTERVAL,
+            "sample_count": sum(self.samples.values()),
+            "steps": self.steps,
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()),
+        }
+
+
+_SUMMARY_FIELDS = ("id", "created_at", "meta", "wall_seconds", "cpu_seconds", "sample_count")
+
+
+class ReportStore:
+    """
+    The most recent `max_reports` reports, as JSON files in a private
+    directory shared by all workers (0700, see ensure_private_dir). Without a
+    directory, or if it can't be used, reports stay in this worker's memory.
+    """
+
+    def __init__(self, max_reports: int, directory: Optional[str]):
+        self.max_reports = max_reports
+        self.directory = None
+        self._reports: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            try:
+                self.directory = Path(ensure_private_dir(directory))
+            except OSError as e:
+                print(f"⚠️ Profile reports kept in memory only ({directory}): {e}")
+
+    def _path(self, report_id: str) -> Optional[Path]:
+        if self.directory is None or not report_id.isalnum():
+            return None
+        return self.directory / f"{report_id}.json"
+
+    def save(self, report: dict) -> None:
+        path = self._path(report["id"])
+        if path is None:
+            with self._lock:
+                self._reports[report["id"]] = report
+                while len(self._reports) > self.max_reports:
+                    self._reports.popitem(last=False)
+            return
+        # written under a temp name and renamed, so readers in other workers never see half a file
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(report, f)
+        os.replace(tmp, path)
+        self._prune()
+
+    def _files(self) -> list[Path]:
+        """Report files, newest first."""
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:   # pruned by another worker
+                continue
+        return [path for _, path in sorted(files, reverse=True)]
+
+    def _prune(self) -> None:
+        for path in self._files()[self.max_reports:]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _load(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def get(self, report_id: str) -> Optional[dict]:
+        path = self._path(report_id)
+        if path is None:
+            with self._lock:
+                return self._reports.get(report_id)
+        return self._load(path)
+
+    def list(self) -> list[dict]:
+        if self.directory is None:
+            with self._lock:
+                reports = list(reversed(self._reports.values()))
+        else:
+            reports = [r for r in map(self._load, self._files()[: self.max_reports]) if r is not None]
+        return [{k: r[k] for k in _SUMMARY_FIELDS} for r in reports]
+
+
+STORE = ReportStore(PROFILE_MAX_REPORTS, PROFILE_DIR)
+
+
+def run_profiled(session: ProfileSession, fn, *args, **kwargs):
+    """Run `fn` on the calling thread under `session`, then store its report."""
+    _local.session = session
+    session.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        session.stop()
+        _local.session = None
+        STORE.save(session.report())
+        print(f"🔬 Stored profile {session.id} ({session.wall_seconds:.2f}s wall)")
@@ -0,0 +1,27 @@
+# backend/utils/json_response.py
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def _default(obj):
+    # already-built models are dumped as-is, never re-validated
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson. Returning it from a route bypasses
+    FastAPI's response_model validation and jsonable_encoder pass, so step
+    outputs are serialized exactly once.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
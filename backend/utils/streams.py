@@ -0,0 +1,119 @@
+# backend/utils/streams.py
+"""
+Bounded hand-off between a producer thread and a consuming iterator.
+
+The producer feeds a sync or async iterable into a fixed-size queue; when the
+consumer falls behind the producer blocks, so a fast stage never races ahead
+of a slow one by more than `maxsize` items. Closing the pipe stops the
+producer at its next item.
+"""
+import asyncio
+import queue
+import threading
+from typing import Callable, Iterator, Optional
+
+from ..services.deadline import DeadlineExceeded
+
+POLL_INTERVAL = 0.1   # seconds between stop/deadline checks while blocked
+
+_DONE = object()
+
+
+class StreamPipe:
+    def __init__(self, maxsize: int, deadline=None, collect: bool = False):
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.deadline = deadline
+        self.items = [] if collect else None   # everything fed, for callers that need the whole output
+        self.error: Optional[BaseException] = None
+
+    # --- producer side ---
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed(self, stream) -> None:
+        """Pump a sync or async iterable into the pipe until it ends or the pipe is closed."""
+        if hasattr(stream, "__aiter__"):
+            asyncio.run(self._feed_async(stream))
+            return
+        it = iter(stream)
+        try:
+            for item in it:
+                if self.items is not None:
+                    self.items.append(item)
+                if not self._put(item):
+                    break
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    async def _feed_async(self, stream) -> None:
+        try:
+            async for item in stream:
+                if self.items is not None:
+                    self.items.append(item)
+                # never block this thread's loop: the async producer may have other tasks in flight
+                while True:
+                    if self._stop.is_set():
+                        return
+                    try:
+                        self._queue.put_nowait(item)
+                        break
+                    except queue.Full:
+                        await asyncio.sleep(POLL_INTERVAL / 10)
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def start(self, produce: Callable[[], None], name: str = "stream") -> "StreamPipe":
+        """Run `produce()` (which calls `feed`) in a background thread."""
+        def target():
+            try:
+                produce()
+            except BaseException as e:
+                self.error = e
+            finally:
+                self._put(_DONE)
+
+        self._thread = threading.Thread(target=target, name=f"stream-{name}", daemon=True)
+        self._thread.start()
+        return self
+
+    # --- consumer side ---
+
+    def __iter__(self) -> Iterator:
+        while True:
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self.deadline is not None:
+                    self.deadline.check("waiting for upstream stream")
+                continue
+            if item is _DONE:
+                # an upstream timeout just ends the stream; the consumer decides what a partial input means
+                if self.error is not None and not isinstance(self.error, DeadlineExceeded):
+                    raise self.error
+                return
+            yield item
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the producer and wait (up to `timeout`) for its thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def background(iterable_factory: Callable[[], object], maxsize: int, deadline=None, name: str = "stream") -> StreamPipe:
+    """Iterate `iterable_factory()` in a background thread, `maxsize` items ahead of the consumer."""
+    pipe = StreamPipe(maxsize, deadline)
+    return pipe.start(lambda: pipe.feed(iterable_factory()), name)
@@ -0,0 +1,146 @@
+# backend/utils/textrank.py
+"""
+Local extractive summarization: TF-IDF sentence vectors ranked with TextRank.
+
+Everything after tokenization is vectorized NumPy. Graph ranking is O(n²) in
+sentences, so very long documents fall back to scoring sentences against the
+TF-IDF centroid of the document, which is O(n·vocab).
+"""
+import re
+from collections import Counter
+from typing import List
+
+MAX_VOCAB = 2000               # most frequent terms kept as features
+MAX_TEXTRANK_SENTENCES = 1500  # above this, centroid scoring instead of TextRank
+MAX_SENTENCE_CHARS = 600       # longer "sentences" are re-split on line breaks, then by words
+MAX_SENTENCE_WORDS = 60
+DAMPING = 0.85
+ITERATIONS = 30
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves also said says one two new
+""".split())
+
+
+def _split_long(sentence: str) -> List[str]:
+    if len(sentence) <= MAX_SENTENCE_CHARS:
+        return [sentence]
+    words = sentence.split()
+    return [" ".join(words[i:i + MAX_SENTENCE_WORDS]) for i in range(0, len(words), MAX_SENTENCE_WORDS)]
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for block in re.split(r"\n\s*\n|\n(?=[-*•\d])", text):
+        flat = " ".join(block.split())
+        if not flat:
+            continue
+        pieces = _SENTENCE_SPLIT.split(flat)
+        if "\n" in block.strip() and any(len(p) > MAX_SENTENCE_CHARS for p in pieces):
+            # little sentence punctuation (typical of PDF/DOCX extraction): fall back to line breaks
+            pieces = [
+                piece
+                for line in block.splitlines()
+                for piece in _SENTENCE_SPLIT.split(" ".join(line.split()))
+            ]
+        for piece in pieces:
+            for sentence in _split_long(piece.strip()):
+                if len(sentence.split()) >= 3:
+                    sentences.append(sentence)
+    return sentences
+
+
+def _truncate(text: str, max_words: int | None, max_chars: int | None) -> str:
+    if max_words and len(text.split()) > max_words:
+        text = " ".join(text.split()[:max_words])
+    if max_chars and len(text) > max_chars:
+        cut = text[:max_chars]
+        text = cut.rsplit(" ", 1)[0] if " " in cut else cut
+    return text
+
+
+def _tfidf(sentences: List[str]):
+    import numpy as np
+
+    tokenized = [[w for w in _WORD.findall(s.lower()) if w not in _STOPWORDS] for s in sentences]
+    counts = Counter(w for words in tokenized for w in words)
+    vocab = {w: i for i, (w, _) in enumerate(counts.most_common(MAX_VOCAB))}
+
+    rows, cols = [], []
+    for r, words in enumerate(tokenized):
+        for w in words:
+            c = vocab.get(w)
+            if c is not None:
+                rows.append(r)
+                cols.append(c)
+
+    tf = np.zeros((len(sentences), max(1, len(vocab))), dtype=np.float32)
+    np.add.at(tf, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)).astype(np.float32) + 1.0
+    x = np.log1p(tf) * idf
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1.0, norms)
+
+
+def score_sentences(sentences: List[str]):
+    """One relevance score per sentence (higher is more central)."""
+    import numpy as np
+
+    n = len(sentences)
+    if n <= 2:
+        return np.ones(n, dtype=np.float32)
+
+    x = _tfidf(sentences)
+
+    if n > MAX_TEXTRANK_SENTENCES:
+        centroid = x.mean(axis=0)
+        return x @ centroid
+
+    sim = x @ x.T
+    np.fill_diagonal(sim, 0.0)
+    row_sums = sim.sum(axis=1, keepdims=True)
+    transition = np.divide(sim, row_sums, out=np.full_like(sim, 1.0 / n), where=row_sums > 0)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    teleport = (1.0 - DAMPING) / n
+    for _ in range(ITERATIONS):
+        updated = teleport + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def extractive_summary(text: str, max_words: int | None = None, max_chars: int | None = None) -> str:
+    """Top-ranked sentences, in their original order, hard-capped to the word/char budget."""
+    sentences = split_sentences(text)
+    if not sentences:
+        return _truncate(text.strip(), max_words, max_chars)
+
+    scores = score_sentences(sentences)
+    chosen, words, chars = [], 0, 0
+    # only the better-ranked half may fill leftover budget
+    ranked = scores.argsort()[::-1][: len(sentences) // 2 + 1]
+    for i in ranked:
+        sentence = sentences[int(i)]
+        n_words, n_chars = len(sentence.split()), len(sentence) + 1
+        if chosen and ((max_words and words + n_words > max_words) or (max_chars and chars + n_chars > max_chars)):
+            continue
+        chosen.append(int(i))
+        words += n_words
+        chars += n_chars
+        if (max_words and words >= max_words) or (max_chars and chars >= max_chars):
+            break
+    # the first pick is taken even if it alone is over budget; the result never is
+    return _truncate(" ".join(sentences[i] for i in sorted(chosen)), max_words, max_chars)
@@ -0,0 +1,89 @@
+import os
+import tempfile
+
+# endpoint tests run the app against a throwaway SQLite database and cache dir;
+# set before anything imports backend.database
+_TMP = tempfile.mkdtemp(prefix="agent_platform_tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'app.sqlite3')}")
+os.environ.setdefault("CACHE_DIR", os.path.join(_TMP, "cache"))
+os.environ.setdefault("ADMIN_EMAILS", "admin@example.com")
+
+import itertools
+
+import pytest
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def api():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def register_tools(api):
+    """Tool rows for the stub tools in tests/stub_tools.py (plus the real summarizer)."""
+    from backend import models
+    from backend.database import SessionLocal
+    from backend.services.agent_runner import invalidate_tool_rows
+
+    db = SessionLocal()
+    try:
+        for name, module_path, class_name in (
+            ("echo", "stub_tools", "EchoTool"),
+            ("fail", "stub_tools", "FailTool"),
+            ("sleep", "stub_tools", "SleepTool"),
+            ("usage", "stub_tools", "UsageTool"),
+            ("script", "stub_tools", "ScriptTool"),
+            ("document", "stub_tools", "DocumentTool"),
+            ("summarizer", "backend.tools.summarizer_tool", "SummarizerTool"),
+        ):
+            db.add(models.Tool(name=name, description=f"test tool {name}", module_path=module_path, class_name=class_name))
+        db.commit()
+    finally:
+        db.close()
+    invalidate_tool_rows()
+
+
+@pytest.fixture
+def make_user(api, register_tools):
+    """Create a user; returns (user_id, auth headers)."""
+    from backend import models
+    from backend.auth import create_access_token
+    from backend.database import SessionLocal
+
+    def make(email: str | None = None):
+        n = next(_ids)
+        db = SessionLocal()
+        try:
+            user = models.User(email=email or f"user{n}@example.com", name=f"User {n}", hashed_password="!")
+            db.add(user)
+            db.commit()
+            user_id = user.id
+        finally:
+            db.close()
+        return user_id, {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    return make
+
+
+@pytest.fixture
+def make_agent():
+    from backend import models
+    from backend.database import SessionLocal
+
+    def make(user_id: int, agent_name: str, workflow: dict) -> int:
+        db = SessionLocal()
+        try:
+            agent = models.Agent(agent_name=agent_name, workflow=workflow, user_id=user_id)
+            db.add(agent)
+            db.commit()
+            return agent.id
+        finally:
+            db.close()
+
+    return make
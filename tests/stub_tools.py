@@ -0,0 +1,53 @@
+"""Minimal tools registered by tests/conftest.py for endpoint tests."""
+import time
+
+
+class EchoTool:
+    def run(self, input_data, context=None, config=None):
+        return f"{(config or {}).get('prefix', 'echo')}: {input_data}"
+
+
+class FailTool:
+    def run(self, input_data, context=None, config=None):
+        raise RuntimeError(f"failed on {input_data}")
+
+
+class SleepTool:
+    def run(self, input_data, context=None, config=None):
+        deadline = (context or {}).get("deadline")
+        end = time.monotonic() + float((config or {}).get("seconds", 1.0))
+        while time.monotonic() < end:
+            if deadline is not None:
+                deadline.check("sleep tool")
+            time.sleep(0.01)
+        return f"slept: {input_data}"
+
+
+class UsageTool:
+    """Keeps working (and spending tokens) past the run deadline, like a slow LLM call."""
+
+    def run(self, input_data, context=None, config=None):
+        time.sleep(float((config or {}).get("seconds", 1.0)))
+        context["token_usage"].record(100, 20)
+        return f"spent: {input_data}"
+
+
+class ScriptTool:
+    """Input "fail" raises; a number sleeps that many seconds (honouring the deadline); anything else echoes."""
+
+    def run(self, input_data, context=None, config=None):
+        if input_data == "fail":
+            raise RuntimeError("scripted failure")
+        try:
+            seconds = float(input_data)
+        except ValueError:
+            return f"echo: {input_data}"
+        return SleepTool().run(input_data, context, {"seconds": seconds})
+
+
+class DocumentTool:
+    """Reports how an uploaded document reached the tool."""
+
+    def run(self, input_data, context=None, config=None):
+        mapped = getattr(input_data, "_mmap", None) is not None
+        return f"{input_data.filename}: {len(input_data.file.read())} bytes, mapped={mapped}"
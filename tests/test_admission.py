@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+import pytest
+
+from backend.services import admission
+from backend.services.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(**overrides) -> AdmissionController:
+    options = dict(
+        max_concurrency=32, min_concurrency=4, per_user=8,
+        queue_size=64, max_queue_time=10.0, adaptive=True,
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def _step_latency(rng: random.Random, slowdown: float = 1.0) -> float:
+    # 30% cache hits (~1 ms), the rest 1-2 s calls of varying size
+    if rng.random() < 0.3:
+        return rng.uniform(0.0005, 0.002)
+    return rng.uniform(1.0, 2.0) * slowdown
+
+
+def _simulate(controller: AdmissionController, seconds: int, steps_per_second: int, rng, slowdown=1.0):
+    for _ in range(seconds):
+        for tool in ("web_search", "summarizer"):
+            for _ in range(steps_per_second):
+                controller.observe_step(tool, _step_latency(rng, slowdown))
+        controller.in_flight = controller.limit   # saturated: the limit may only grow or shrink
+        controller._last_adjust = 0.0
+        controller._adjust()
+    controller.in_flight = 0
+
+
+def test_steady_mixed_traffic_keeps_the_limit():
+    controller = _controller()
+    _simulate(controller, seconds=120, steps_per_second=8, rng=random.Random(7))
+    assert controller.limit == 32
+
+
+def test_sustained_slowdown_shrinks_the_limit():
+    controller = _controller()
+    rng = random.Random(11)
+    _simulate(controller, seconds=60, steps_per_second=8, rng=rng)
+    _simulate(controller, seconds=10, steps_per_second=8, rng=rng, slowdown=3.0)
+    assert controller.limit < 32
+    assert controller.limit >= controller.min_concurrency
+
+
+def test_idle_period_does_not_change_the_limit():
+    controller = _controller(max_concurrency=8)
+    _simulate(controller, seconds=30, steps_per_second=8, rng=random.Random(3), slowdown=1.0)
+    controller.limit = 6
+    for _ in range(10):
+        controller._last_adjust = 0.0
+        controller._adjust()
+    assert controller.limit == 6
+
+
+def test_slot_is_held_until_released():
+    async def scenario():
+        controller = _controller(max_concurrency=1, min_concurrency=1, per_user=0, max_queue_time=0.2)
+        release = await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("b")
+        assert rejected.value.status_code == 503
+        release()
+        release()   # idempotent
+        assert controller.in_flight == 0
+        (await controller.acquire("b"))()
+
+    asyncio.run(scenario())
+
+
+def test_per_user_limit_rejects_or_queues():
+    async def scenario():
+        controller = _controller(max_concurrency=4, min_concurrency=1, per_user=1)
+        release = await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("a")
+        assert rejected.value.status_code == 429
+
+        waiting = asyncio.ensure_future(controller.acquire("a", queue_for_user=True, cap_wait=False))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release()
+        (await asyncio.wait_for(waiting, 1.0))()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_disabled_controller_admits_everything():
+    async def scenario():
+        controller = _controller(max_concurrency=0)
+        releases = [await controller.acquire("a") for _ in range(100)]
+        for release in releases:
+            release()
+
+    asyncio.run(scenario())
+    assert admission.ADMISSION.enabled == (admission.ADMISSION_MAX_CONCURRENCY > 0)
@@ -0,0 +1,60 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+from backend.services.article_cache import ArticleCache, ArticleFetcher, NotHTMLError, _decode_html
+
+PAGE = "<html><head><meta charset=\"utf-8\"><title>Café</title></head><body>Naïve résumé – ✓</body></html>"
+ROUTES = {
+    "/meta-charset": ("text/html", PAGE.encode("utf-8")),
+    "/no-charset": ("text/html", PAGE.replace("<meta charset=\"utf-8\">", "").encode("utf-8")),
+    "/header-charset": ("text/html; charset=windows-1252", "<p>café</p>".encode("cp1252")),
+    "/paper.pdf": ("application/pdf", b"%PDF-1.4\n%%EOF\n"),
+}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = ROUTES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_meta_charset_wins_over_latin1_default(base_url):
+    response = requests.get(f"{base_url}/meta-charset")
+    assert response.encoding == "ISO-8859-1"   # what response.text would have used
+    assert _decode_html(response) == PAGE
+
+
+def test_no_charset_falls_back_to_detected_encoding(base_url):
+    text = _decode_html(requests.get(f"{base_url}/no-charset"))
+    assert "Naïve résumé – ✓" in text
+
+
+def test_header_charset_is_respected(base_url):
+    assert _decode_html(requests.get(f"{base_url}/header-charset")) == "<p>café</p>"
+
+
+def test_non_html_is_skipped_and_not_cached(base_url, tmp_path):
+    pytest.importorskip("zstandard")
+    store = ArticleCache(str(tmp_path / "articles.sqlite3"), 1024 * 1024)
+    fetcher = ArticleFetcher(store)
+    with pytest.raises(NotHTMLError):
+        fetcher.fetch(f"{base_url}/paper.pdf", timeout=5)
+    assert store._conn().execute("SELECT COUNT(*) FROM articles").fetchone() == (0,)
@@ -0,0 +1,49 @@
+import json
+
+from backend.services.admission import ADMISSION
+
+
+def _batch(api, headers, agent_name: str, queries: list, **options) -> list:
+    response = api.post(
+        "/run-batch", headers=headers,
+        json={"agent_name": agent_name, "session_id": "batch", "queries": queries, **options},
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_lines_arrive_in_completion_order(api, make_user, make_agent):
+    user_id, headers = make_user()
+    make_agent(user_id, "script", {"tools": [{"name": "script"}]})
+    lines = _batch(api, headers, "script", ["0.6", "0", "0.3"], max_concurrency=3)
+    assert [line["index"] for line in lines] == [1, 2, 0]
+    assert lines[0] == {"index": 1, "query": "0", "output": "slept: 0", "error": None}
+    assert ADMISSION.in_flight == 0
+
+
+def test_item_errors_do_not_stop_the_batch(api, make_user, make_agent):
+    user_id, headers = make_user()
+    make_agent(user_id, "script-errors", {"tools": [{"name": "script"}]})
+    lines = sorted(_batch(api, headers, "script-errors", ["a", "fail", "b"]), key=lambda line: line["index"])
+    assert [line["output"] for line in lines] == ["echo: a", None, "echo: b"]
+    assert lines[1]["error"] == "Execution failed in 'script': scripted failure"
+    assert lines[0]["error"] is None and lines[2]["error"] is None
+
+
+def test_each_item_gets_its_own_timeout(api, make_user, make_agent):
+    user_id, headers = make_user()
+    make_agent(user_id, "script-timeout", {"tools": [{"name": "script"}]})
+    lines = sorted(
+        _batch(api, headers, "script-timeout", ["5", "0.05", "ok"], timeout=0.3, max_concurrency=1),
+        key=lambda line: line["index"],
+    )
+    assert lines[0]["output"] is None and "deadline" in lines[0]["error"].lower()
+    # queued behind the timed-out item, yet each later item gets a fresh deadline
+    assert [line["output"] for line in lines[1:]] == ["slept: 0.05", "echo: ok"]
+
+
+def test_unknown_agent_is_404(api, make_user):
+    _, headers = make_user()
+    response = api.post("/run-batch", headers=headers, json={"agent_name": "nope", "session_id": "s", "queries": ["q"]})
+    assert response.status_code == 404
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backend.services.cache import Cache, SQLiteCache
+
+
+def _workers(tmp_path, max_entries: int = 1000):
+    """Two caches for one namespace over one file, like two uvicorn workers on a host."""
+    path = str(tmp_path / "cache.sqlite3")
+    return Cache("test", SQLiteCache(path, max_entries)), Cache("test", SQLiteCache(path, max_entries))
+
+
+def test_value_set_by_one_worker_is_a_hit_for_the_other(tmp_path):
+    first, second = _workers(tmp_path)
+    first.set("k", {"answer": [1, 2]}, ttl=60)
+    assert second.get("k") == {"answer": [1, 2]}
+
+
+def test_entries_expire(tmp_path):
+    first, second = _workers(tmp_path)
+    first.set("k", "v", ttl=0.1)
+    time.sleep(0.15)
+    assert first.get("k") is None and second.get("k") is None
+
+
+def test_concurrent_miss_waits_for_the_lease_holder(tmp_path):
+    first, second = _workers(tmp_path)
+    calls = []
+
+    def slow():
+        calls.append("first")
+        time.sleep(0.3)
+        return "computed once"
+
+    holder = threading.Thread(target=lambda: first.get_or_compute("k", slow, ttl=60))
+    holder.start()
+    time.sleep(0.05)
+    assert second.get_or_compute("k", lambda: calls.append("second") or "again", ttl=60) == "computed once"
+    holder.join()
+    assert calls == ["first"]
+
+
+def test_expired_lease_of_a_dead_worker_is_taken_over(tmp_path):
+    first, second = _workers(tmp_path)
+    assert first.l2.acquire_lease("test:k", "crashed-worker", 0.2)
+    started = time.monotonic()
+    assert second.get_or_compute("k", lambda: "recomputed", ttl=60, lease=5) == "recomputed"
+    assert time.monotonic() - started < 2
+
+
+def test_failed_compute_is_not_cached_and_frees_the_lease(tmp_path):
+    first, second = _workers(tmp_path)
+
+    def broken():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        first.get_or_compute("k", broken, ttl=60)
+    assert first.get("k") is None
+    assert not first.l2.lease_held("test:k")
+    assert second.get_or_compute("k", lambda: "fine now", ttl=60) == "fine now"
+
+
+def test_broken_lease_check_computes_locally(tmp_path, monkeypatch):
+    first, second = _workers(tmp_path)
+    assert first.l2.acquire_lease("test:k", "other-worker", 30)
+
+    def locked(key):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(second.l2, "lease_held", locked)
+    assert second.get_or_compute("k", lambda: "local", ttl=60, lease=5) == "local"
+
+
+def test_eviction_keeps_the_longest_lived_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteCache, "EVICT_EVERY", 1)
+    first, second = _workers(tmp_path, max_entries=5)
+    for n in range(10):
+        first.set(f"k{n}", n, ttl=60 + n)
+    conn = second.l2._conn()
+    (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+    assert count == 5
+    assert second.get("k9") == 9
+    remaining = {key for (key,) in conn.execute("SELECT key FROM entries")}
+    assert remaining == {f"test:k{n}" for n in range(5, 10)}
+
+
+def test_l1_is_bounded(tmp_path):
+    cache = Cache("test", None, l1_size=3)
+    for n in range(5):
+        cache.set(f"k{n}", n, ttl=60)
+    assert [cache.get(f"k{n}") for n in range(5)] == [None, None, 2, 3, 4]
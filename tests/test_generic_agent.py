@@ -0,0 +1,44 @@
+from backend.agents.generic import GenericAgent
+from backend.schemas import Workflow
+
+
+class Producer:
+    def run(self, input_data, context=None, config=None):
+        return ["a", "b", "c"]
+
+    def run_stream(self, input_data, context=None, config=None):
+        yield from self.run(input_data, context, config)
+
+    def assemble(self, results, query, config=None):
+        return list(results)
+
+
+class Consumer:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, input_data, context=None, config=None):
+        self.calls.append("run")
+        return "+".join(input_data)
+
+    def run_from_stream(self, items, context=None, config=None):
+        self.calls.append("run_from_stream")
+        return "+".join(items)
+
+
+def _run(workflow: dict):
+    consumer = Consumer()
+    agent = GenericAgent("test", workflow, {"producer": Producer(), "consumer": consumer})
+    return agent.run("query", "session"), consumer.calls
+
+
+STEPS = [{"name": "producer"}, {"name": "consumer", "input_from": "producer"}]
+
+
+def test_default_workflow_runs_steps_one_after_another():
+    assert Workflow(tools=STEPS).streaming is False
+    assert _run({"tools": STEPS}) == ("a+b+c", ["run"])
+
+
+def test_streaming_is_opt_in():
+    assert _run({"tools": STEPS, "streaming": True}) == ("a+b+c", ["run_from_stream"])
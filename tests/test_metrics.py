@@ -0,0 +1,87 @@
+import pytest
+
+from backend.tracing import metrics
+from backend.tracing.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics created in a test register here instead of the process-wide registry."""
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(metrics, "REGISTRY", fresh)
+    return fresh
+
+
+def test_counter_with_labels(registry):
+    calls = Counter("test_calls_total", "Test calls.", ("model", "outcome"))
+    calls.labels(model="gpt", outcome="ok").inc()
+    calls.labels(model="gpt", outcome="ok").inc(2)
+    calls.labels(model="gpt", outcome="error").inc()
+    assert registry.render() == (
+        "# HELP test_calls_total Test calls.\n"
+        "# TYPE test_calls_total counter\n"
+        'test_calls_total{model="gpt",outcome="ok"} 3.0\n'
+        'test_calls_total{model="gpt",outcome="error"} 1.0\n'
+    )
+
+
+def test_label_values_are_escaped(registry):
+    Counter("test_escaped_total", "Escaping.", ("value",)).labels(value='a"b\\c\nd').inc()
+    assert 'test_escaped_total{value="a\\"b\\\\c\\nd"} 1.0' in registry.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = Histogram("test_latency_seconds", "Latency.", ("route",), buckets=(0.5, 0.1, 1.0))
+    for value in (0.05, 0.1, 0.7, 3.0):
+        latency.labels(route="/x").observe(value)
+    lines = registry.render().splitlines()
+    assert lines[1] == "# TYPE test_latency_seconds histogram"
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{route="/x",le="0.1"} 2',   # upper bounds are inclusive
+        'test_latency_seconds_bucket{route="/x",le="0.5"} 2',
+        'test_latency_seconds_bucket{route="/x",le="1.0"} 3',
+        'test_latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/x"} 3.85',
+        'test_latency_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_histogram_timer(registry):
+    latency = Histogram("test_timer_seconds", "Timer.")
+    with latency.labels().time():
+        pass
+    assert "test_timer_seconds_count 1" in registry.render().splitlines()
+
+
+def test_gauges(registry):
+    Gauge("test_plain", "Settable.").set(7)
+    Gauge("test_callback", "Computed.", callback=lambda: 1.5)
+    Gauge("test_labelled", "Computed per label.", ("state",), callback=lambda: {("busy",): 2, ("idle",): 3})
+    Gauge("test_broken", "Failing callback.", callback=lambda: 1 / 0)
+    lines = registry.render().splitlines()
+    assert "test_plain 7" in lines
+    assert "test_callback 1.5" in lines
+    assert 'test_labelled{state="busy"} 2' in lines and 'test_labelled{state="idle"} 3' in lines
+    # a failing callback drops its samples, not the whole scrape
+    assert "# TYPE test_broken gauge" in lines
+    assert not any(line.startswith("test_broken ") for line in lines)
+
+
+def test_output_parses_as_prometheus_text(registry):
+    parser = pytest.importorskip("prometheus_client.parser")
+    Counter("test_parsed_total", "Parsed.", ("k",)).labels(k="v").inc()
+    Histogram("test_parsed_seconds", "Parsed.", buckets=(1.0,)).observe(0.5)
+    families = {family.name: family for family in parser.text_string_to_metric_families(registry.render())}
+    assert families["test_parsed"].type == "counter"
+    assert families["test_parsed_seconds"].type == "histogram"
+
+
+def test_metrics_endpoint(api, make_user):
+    _, headers = make_user()
+    assert api.get("/agents", headers=headers).status_code == 200
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert any(line.startswith('http_request_duration_seconds_count{method="GET",route="/agents",status="200"}') for line in lines)
+    assert any(line.startswith('threadpool_workers{state="limit"}') for line in lines)
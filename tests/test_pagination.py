@@ -0,0 +1,76 @@
+import pytest
+
+from backend import crud
+
+
+def _pages(api, path: str, headers, limit: int, **params) -> list:
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = api.get(path, headers=headers, params=query)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    for last_id in (1, 42, 10 ** 12):
+        cursor = crud.encode_cursor(last_id)
+        assert "=" not in cursor
+        assert crud.decode_cursor(cursor) == last_id
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "YWJj", ""])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        crud.decode_cursor(cursor)
+
+
+def test_agents_are_paged_by_id(api, make_user, make_agent):
+    user_id, headers = make_user()
+    other_id, _ = make_user()
+    ids = [make_agent(user_id, f"agent-{n}", {"tools": [{"name": "echo"}]}) for n in range(5)]
+    make_agent(other_id, "someone-else", {"tools": [{"name": "echo"}]})
+
+    pages = _pages(api, "/agents", headers, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [agent["id"] for page in pages for agent in page] == ids
+    assert all(set(agent) == {"id", "agent_name"} for page in pages for agent in page)
+
+
+def test_exact_last_page_has_no_cursor(api, make_user, make_agent):
+    user_id, headers = make_user()
+    for n in range(2):
+        make_agent(user_id, f"pair-{n}", {"tools": [{"name": "echo"}]})
+    response = api.get("/agents", headers=headers, params={"limit": 2})
+    assert len(response.json()) == 2 and "X-Next-Cursor" not in response.headers
+
+
+def test_workflow_only_with_include_workflow(api, make_user, make_agent):
+    user_id, headers = make_user()
+    workflow = {"tools": [{"name": "echo", "config": {"prefix": "p"}}]}
+    make_agent(user_id, "with-workflow", workflow)
+    (agent,) = api.get("/agents", headers=headers, params={"include_workflow": True}).json()
+    assert agent["workflow"] == workflow
+
+
+def test_invalid_cursor_is_400(api, make_user):
+    _, headers = make_user()
+    response = api.get("/agents", headers=headers, params={"cursor": "not-base64!"})
+    assert response.status_code == 400
+
+
+def test_page_size_is_bounded(api, make_user):
+    _, headers = make_user()
+    assert api.get("/agents", headers=headers, params={"limit": 0}).status_code == 422
+    assert api.get("/agents", headers=headers, params={"limit": 501}).status_code == 422
+
+
+def test_tools_are_paged_by_id(api, make_user):
+    _, headers = make_user()
+    pages = _pages(api, "/tools", headers, limit=2)
+    names = [tool["name"] for page in pages for tool in page]
+    assert len(names) == len(set(names)) and {"echo", "fail", "summarizer"} <= set(names)
+    assert all(len(page) <= 2 for page in pages)
@@ -0,0 +1,59 @@
+import os
+import time
+
+from backend.tracing.profiler import ReportStore
+
+
+def _report(report_id: str) -> dict:
+    return {
+        "id": report_id, "created_at": time.time(), "meta": {"route": "/run-task"},
+        "wall_seconds": 0.1, "cpu_seconds": 0.05, "sample_count": 3, "steps": [], "collapsed": "a;b 3",
+    }
+
+
+def test_report_saved_by_one_worker_is_served_by_another(tmp_path):
+    directory = str(tmp_path / "profiles")
+    writer, reader = ReportStore(10, directory), ReportStore(10, directory)
+    writer.save(_report("abc123"))
+    assert reader.get("abc123")["collapsed"] == "a;b 3"
+    assert [r["id"] for r in reader.list()] == ["abc123"]
+    assert "collapsed" not in reader.list()[0]
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+
+
+def test_oldest_reports_are_pruned(tmp_path):
+    store = ReportStore(3, str(tmp_path / "profiles"))
+    for n in range(5):
+        store.save(_report(f"r{n}"))
+        time.sleep(0.01)
+    assert [r["id"] for r in store.list()] == ["r4", "r3", "r2"]
+    assert store.get("r0") is None
+
+
+def test_unsafe_ids_are_not_looked_up(tmp_path):
+    store = ReportStore(3, str(tmp_path / "profiles"))
+    assert store.get("../secret") is None
+
+
+def test_shared_directory_is_refused(tmp_path):
+    directory = tmp_path / "profiles"
+    directory.mkdir(mode=0o755)
+    os.chmod(directory, 0o755)
+    store = ReportStore(3, str(directory))
+    assert store.directory is None   # falls back to this worker's memory
+    store.save(_report("mem1"))
+    assert store.get("mem1") is not None and list(directory.iterdir()) == []
+
+
+def test_profiled_run_is_retrievable(api, make_user, make_agent):
+    user_id, headers = make_user("admin@example.com")
+    make_agent(user_id, "profiled", {"tools": [{"name": "echo"}]})
+    response = api.post(
+        "/run-task", headers={**headers, "X-Profile": "1"},
+        json={"query": "hi", "session_id": "p", "agent_name": "profiled", "user_id": user_id},
+    )
+    assert response.status_code == 200, response.text
+    profile_id = response.headers["X-Profile-Id"]
+    report = api.get(f"/admin/profiles/{profile_id}", headers=headers).json()
+    assert report["meta"]["session_id"] == "p"
+    assert profile_id in [r["id"] for r in api.get("/admin/profiles", headers=headers).json()]
@@ -0,0 +1,144 @@
+import time
+import pytest
+
+from backend.services.admission import ADMISSION
+from backend.utils.textrank import split_sentences
+
+TEXT = (
+    "The committee approved the new budget after a long debate. "
+    "Funding for public transport rises by ten percent next year. "
+    "Road maintenance keeps the same share as before. "
+    "Critics argue the plan ignores rural areas entirely. "
+    "A final vote is expected before the end of the month."
+)
+
+
+def test_run_task_runs_the_agent(api, make_user, make_agent):
+    user_id, headers = make_user()
+    make_agent(user_id, "echo-agent", {"tools": [{"name": "echo", "config": {"prefix": "got"}}]})
+    response = api.post(
+        "/run-task", headers=headers,
+        json={"query": "hello", "session_id": "s1", "agent_name": "echo-agent", "user_id": user_id},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"output": "got: hello", "session_id": "s1"}
+    assert ADMISSION.in_flight == 0
+
+
+def test_run_task_with_real_summarizer(api, make_user, make_agent):
+    user_id, headers = make_user()
+    make_agent(user_id, "summary-agent", {"tools": [{"name": "summarizer", "config": {"mode": "extractive"}}]})
+    response = api.post(
+        "/run-task", headers=headers,
+        json={"query": TEXT, "session_id": "s2", "agent_name": "summary-agent", "user_id": user_id},
+    )
+    assert response.status_code == 200, response.text
+    output = response.json()["output"]
+    assert output and set(split_sentences(output)) <= set(split_sentences(TEXT))
+
+
+def test_run_agent_by_id(api, make_user, make_agent):
+    user_id, headers = make_user()
+    agent_id = make_agent(user_id, "echo-by-id", {"tools": [{"name": "echo"}]})
+    response = api.post(
+        "/run-agent", headers=headers, params={"agent_id": agent_id, "query": "hi", "session_id": "s3"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["output"] == "echo: hi"
+
+
+def test_unknown_agent_is_404(api, make_user):
+    _, headers = make_user()
+    response = api.post(
+        "/run-task", headers=headers,
+        json={"query": "x", "session_id": "s", "agent_name": "missing", "user_id": 0},
+    )
+    assert response.status_code == 404
+
+
+def _failing_threadpool(monkeypatch):
+    """Make scheduling the agent worker fail; everything else still runs in the threadpool."""
+    import functools
+    from backend import main
+
+    original = main.run_in_threadpool
+
+    def run_in_threadpool(fn, *args, **kwargs):
+        if isinstance(fn, functools.partial):
+            raise RuntimeError("threadpool unavailable")
+        return original(fn, *args, **kwargs)
+
+    monkeypatch.setattr(main, "run_in_threadpool", run_in_threadpool)
+
+
+def test_slot_is_released_when_the_worker_cannot_start(api, make_user, make_agent, monkeypatch):
+    user_id, headers = make_user()
+    make_agent(user_id, "never-starts", {"tools": [{"name": "echo"}]})
+    _failing_threadpool(monkeypatch)
+    for _ in range(ADMISSION.per_user + 2):
+        with pytest.raises(RuntimeError, match="threadpool unavailable"):
+            api.post(
+                "/run-task", headers=headers,
+                json={"query": "x", "session_id": "s", "agent_name": "never-starts", "user_id": user_id},
+            )
+    assert ADMISSION.in_flight == 0
+    monkeypatch.undo()
+    response = api.post(
+        "/run-task", headers=headers,
+        json={"query": "x", "session_id": "s", "agent_name": "never-starts", "user_id": user_id},
+    )
+    assert response.status_code == 200
+
+
+def test_upload_is_closed_when_the_worker_cannot_start(api, make_user, make_agent, monkeypatch):
+    from backend.services.uploads import UploadedDocument
+
+    user_id, headers = make_user()
+    make_agent(user_id, "upload-never-starts", {"tools": [{"name": "echo"}]})
+    closed = []
+    original_close = UploadedDocument.close
+    monkeypatch.setattr(UploadedDocument, "close", lambda self: (closed.append(self.filename), original_close(self)))
+    _failing_threadpool(monkeypatch)
+    with pytest.raises(RuntimeError, match="threadpool unavailable"):
+        api.post(
+            "/run-task/upload", headers=headers,
+            data={"agent_name": "upload-never-starts", "session_id": "s"},
+            files={"file": ("notes.txt", b"x" * 4096, "text/plain")},
+        )
+    assert closed == ["notes.txt"]
+    assert ADMISSION.in_flight == 0
+
+
+def _usage_rows(user_id: int) -> list:
+    from backend import models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return [
+            (row.session_id, row.llm_calls, row.prompt_tokens)
+            for row in db.query(models.RunUsage).filter(models.RunUsage.user_id == user_id)
+        ]
+    finally:
+        db.close()
+
+
+def test_usage_is_saved_when_the_worker_finishes_after_a_504(api, make_user, make_agent, monkeypatch):
+    from backend import main
+
+    monkeypatch.setattr(main, "DEADLINE_GRACE_PERIOD", 0.1)
+    monkeypatch.setattr(main, "DISCONNECT_POLL_INTERVAL", 0.05)
+    user_id, headers = make_user()
+    make_agent(user_id, "slow-spender", {"tools": [{"name": "usage", "config": {"seconds": 1.0}}]})
+    response = api.post(
+        "/run-task", headers=headers,
+        json={"query": "x", "session_id": "late", "agent_name": "slow-spender", "user_id": user_id, "timeout": 0.2},
+    )
+    assert response.status_code == 504
+    assert _usage_rows(user_id) == []   # the worker is still running
+
+    give_up = time.monotonic() + 5
+    while not _usage_rows(user_id) and time.monotonic() < give_up:
+        time.sleep(0.05)
+    assert _usage_rows(user_id) == [("late", 1, 100)]
+    assert ADMISSION.in_flight == 0
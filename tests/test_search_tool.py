@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from backend.tools.search_tool import WebSearchTool
+
+
+def _tool(payload: dict) -> WebSearchTool:
+    tool = WebSearchTool()
+    tool.session = SimpleNamespace(get=lambda *args, **kwargs: SimpleNamespace(json=lambda: payload))
+    return tool
+
+
+def test_serpapi_fields_are_coerced():
+    output = _tool({"organic_results": [
+        {"title": None, "snippet": ["first part", "second part"], "link": "https://a.example", "position": 1},
+        {"title": 42, "snippet": {"text": "odd"}, "position": "2"},
+        "not a result",
+    ]}).run("query", config={"cache_ttl": 0})
+    first, second = output.results
+    assert (first.title, first.snippet, first.link, first.extra) == (
+        "No Title", "first part second part", "https://a.example", {"position": 1},
+    )
+    assert (second.title, second.snippet, second.link, second.extra) == ("42", "{'text': 'odd'}", "", {"position": None})
+    # what model_construct built must survive a validating round trip
+    assert type(output).model_validate(output.model_dump()) == output
+
+
+def test_missing_results_give_empty_output():
+    assert _tool({"error": "quota"}).run("query", config={"cache_ttl": 0}).results == []
@@ -0,0 +1,145 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from backend.services.deadline import Deadline, DeadlineExceeded
+from backend.tools.summarizer_tool import SummarizerTool, _RunState
+
+SHORT = "A short paragraph about routing. " * 20      # ~160 tokens
+LONG = "A long paragraph about routing. " * 500       # ~4000 tokens, still one chunk
+
+# model -> "ok", "error" (HTTP 400, not retried by the client) or a delay in seconds
+BEHAVIOUR: dict = {}
+REQUESTS: list = []
+
+
+class _ChatCompletions(http.server.BaseHTTPRequestHandler):
+    """The slice of the OpenAI API the summarizer uses: POST /v1/chat/completions."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        REQUESTS.append(model)
+        behaviour = BEHAVIOUR.get(model, "ok")
+        if self.path != "/v1/chat/completions" or behaviour == "error":
+            self._send(400, {"error": {"message": f"{model} rejected the request", "type": "invalid_request_error"}})
+            return
+        if behaviour != "ok":
+            time.sleep(behaviour)
+        self._send(200, {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": f" summary by {model} "},
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        })
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # the client timed out and went away
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletions)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def tool(base_url, monkeypatch):
+    monkeypatch.setattr(SummarizerTool, "LLM_CACHE_TTL", 0)
+    BEHAVIOUR.clear()
+    REQUESTS.clear()
+    tool = SummarizerTool()
+    tool._client = openai.OpenAI(api_key="test-key", base_url=base_url)
+    return tool
+
+
+def test_short_input_routes_to_small_model(tool):
+    state = _RunState()
+    assert tool._call_llm("Summarize.", SHORT, state) == "summary by gpt-4o-mini"
+    assert REQUESTS == ["gpt-4o-mini"]
+    assert state.usage.total_tokens == 120
+
+
+def test_long_input_routes_to_large_context_model(tool):
+    state = _RunState()
+    assert tool._call_llm("Summarize.", LONG, state) == "summary by gpt-3.5-turbo-16k"
+    assert REQUESTS == ["gpt-3.5-turbo-16k"]
+    assert state.routing[0]["input_tokens"] > 3000
+
+
+def test_error_falls_back_to_next_model(tool):
+    BEHAVIOUR["gpt-4o-mini"] = "error"
+    state = _RunState()
+    assert tool._call_llm("Summarize.", SHORT, state) == "summary by gpt-3.5-turbo-16k"
+    assert REQUESTS == ["gpt-4o-mini", "gpt-3.5-turbo-16k"]
+    assert [(r["model"], r["outcome"]) for r in state.routing] == [
+        ("gpt-4o-mini", "error"), ("gpt-3.5-turbo-16k", "ok"),
+    ]
+    assert "rejected the request" in state.routing[0]["error"]
+
+
+def test_route_timeout_falls_back_without_retrying(tool):
+    BEHAVIOUR["slow-model"] = 3.0
+    routes = {"map": [{"max_input_tokens": None, "models": ["slow-model", "fast-model"], "timeout": 0.3}]}
+    state = _RunState(routes=routes)
+    started = time.perf_counter()
+    assert tool._call_llm("Summarize.", SHORT, state) == "summary by fast-model"
+    assert time.perf_counter() - started < 2.0
+    # with_options(max_retries=0): the timed-out model is asked exactly once
+    assert REQUESTS == ["slow-model", "fast-model"]
+    assert state.routing[0]["outcome"] == "error"
+
+
+def test_deadline_caps_the_request_timeout(tool):
+    BEHAVIOUR["gpt-4o-mini"] = 3.0
+    state = _RunState(deadline=Deadline.from_seconds(0.5))
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        tool._call_llm("Summarize.", SHORT, state)
+    assert time.perf_counter() - started < 2.0
+    assert REQUESTS == ["gpt-4o-mini"]
+
+
+def test_all_models_failing_returns_warning(tool):
+    BEHAVIOUR.update({"gpt-4o-mini": "error", "gpt-3.5-turbo-16k": "error"})
+    state = _RunState()
+    assert tool._call_llm("Summarize.", SHORT, state).startswith("⚠️ Summarization failed")
+    assert [r["outcome"] for r in state.routing] == ["error", "error"]
+
+
+def test_routing_is_reported_in_summarizer_details(tool):
+    BEHAVIOUR["gpt-4o-mini"] = "error"
+    context = {}
+    routing = {"map": [{"max_input_tokens": None, "models": ["gpt-4o-mini", "gpt-4o"]}]}
+    summary = tool.run(SHORT, context, {"routing": routing})
+    assert summary == "summary by gpt-4o"
+    records = context["summarizer_details"]["routing"]
+    assert [(r["role"], r["model"], r["outcome"]) for r in records] == [
+        ("map", "gpt-4o-mini", "error"), ("map", "gpt-4o", "ok"),
+    ]
+    assert all(set(r) >= {"role", "input_tokens", "model", "outcome", "seconds"} for r in records)
@@ -0,0 +1,68 @@
+import pytest
+
+from backend.services.token_budget import TokenBudget, TokenBudgetExceeded, TokenUsage
+from backend.tools import summarizer_tool
+from backend.tools.summarizer_tool import SummarizerTool
+
+SOURCE = "Plain words in a long article body. " * 550   # ~20 KB: two chunks + a consolidation call
+
+
+def _tool(calls: list) -> SummarizerTool:
+    tool = SummarizerTool()
+
+    def fake_llm(prompt, text, state, role="map"):
+        calls.append(role)
+        state.usage.record(500, 100)
+        return "short summary of the text"
+
+    tool._call_llm = fake_llm
+    return tool
+
+
+def _run(tool, budget, monkeypatch, sources: int, **config):
+    monkeypatch.setattr(summarizer_tool, "BUDGET", budget)
+    context = {"user_id": 1, "token_usage": TokenUsage()}
+    config = dict({"expected_sources": sources, "budget_policy": "reject"}, **config)
+    return tool.run_from_stream(iter([SOURCE] * sources), context, config), context
+
+
+def test_stream_is_admitted_once_and_settled_to_actual_use(monkeypatch):
+    calls = []
+    budget = TokenBudget(user_limit=40000, global_limit=0)
+    summary, context = _run(_tool(calls), budget, monkeypatch, sources=5)
+    assert summary == "short summary of the text"
+    assert len(calls) == 5 * 3 + 1
+    assert context["token_usage"].estimated_tokens > context["token_usage"].total_tokens
+    # one reservation for the run, settled to what it really used
+    assert [tokens for _, tokens in budget._users[1]] == [len(calls) * 600]
+
+
+def test_stream_over_budget_is_rejected_before_any_llm_call(monkeypatch):
+    calls = []
+    budget = TokenBudget(user_limit=5000, global_limit=0)
+    budget.admit(1, 1000)   # the user's earlier run this minute
+    with pytest.raises(TokenBudgetExceeded):
+        _run(_tool(calls), budget, monkeypatch, sources=5)
+    assert calls == []
+
+
+def test_stream_downgrade_is_decided_up_front(monkeypatch):
+    calls = []
+    budget = TokenBudget(user_limit=20000, global_limit=0)
+    budget.admit(1, 5000)
+    _, context = _run(_tool(calls), budget, monkeypatch, sources=5, budget_policy="downgrade")
+    assert context["summarizer_details"]["mode"] == "hybrid"
+    assert calls.count("map") == 5    # one call per reduced source
+
+
+def test_stream_estimate_is_capped_at_a_small_limit(monkeypatch):
+    # the conservative whole-run estimate (~47k tokens) can't ever fit a 3k limit;
+    # small articles must still get through instead of a 429 on every run
+    calls = []
+    budget = TokenBudget(user_limit=3000, global_limit=0)
+    monkeypatch.setattr(summarizer_tool, "BUDGET", budget)
+    tool = _tool(calls)
+    items = iter(["A short article about budgets and limits. It has two sentences."] * 2)
+    summary = tool.run_from_stream(items, {"user_id": 1, "token_usage": TokenUsage()}, {"budget_policy": "reject"})
+    assert summary == "short summary of the text"
+    assert [tokens for _, tokens in budget._users[1]] == [len(calls) * 600]
@@ -0,0 +1,33 @@
+import random
+
+from backend.utils.textrank import extractive_summary, split_sentences
+
+WORDS = ["data", "model", "result", "table", "value", "system", "analysis", "figure", "method", "sample"]
+
+
+def _lines(count: int, words_per_line: int = 12, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    return "\n".join(" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(count))
+
+
+def test_unpunctuated_lines_split_on_line_breaks():
+    text = _lines(200)
+    assert len(split_sentences(text)) == 200
+
+
+def test_punctuated_prose_keeps_sentence_split():
+    text = "The first sentence wraps\nonto a second line. Another one follows it."
+    assert split_sentences(text) == ["The first sentence wraps onto a second line.", "Another one follows it."]
+
+
+def test_pdf_like_input_is_capped_to_max_chars():
+    text = _lines(25000)   # ~300 KB, single line breaks only
+    assert len(text) > 300_000
+    summary = extractive_summary(text, max_chars=6000)
+    assert 0 < len(summary) <= 6000
+
+
+def test_single_huge_line_is_capped():
+    text = _lines(1, words_per_line=50000)
+    assert len(extractive_summary(text, max_chars=6000)) <= 6000
+    assert len(extractive_summary(text, max_words=100).split()) <= 100
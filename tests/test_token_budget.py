@@ -0,0 +1,108 @@
+import pytest
+
+from backend.services import token_budget
+from backend.services.token_budget import ADMIT, TokenBudget, TokenBudgetExceeded, TokenUsage
+from backend.tools import summarizer_tool
+from backend.tools.summarizer_tool import SummarizerTool
+
+ARTICLE = "Plain words in a long article body. " * 200   # ~7 KB, one LLM call when admitted in full
+
+
+def _workers(tmp_path, **limits):
+    """Two budgets over one file, like two uvicorn workers on a host."""
+    path = str(tmp_path / "cache.sqlite3")
+    return TokenBudget(path=path, **limits), TokenBudget(path=path, **limits)
+
+
+def test_budget_is_shared_between_workers(tmp_path):
+    first, second = _workers(tmp_path, user_limit=1000, global_limit=0)
+    assert first.admit("u", 800, policy="reject")[0] == ADMIT
+    with pytest.raises(TokenBudgetExceeded) as exceeded:
+        second.admit("u", 300, policy="reject")
+    assert 1.0 <= exceeded.value.retry_after <= token_budget.WINDOW_SECONDS
+    second.admit("other", 300, policy="reject")   # per-user windows stay separate
+
+
+def test_global_limit_is_host_wide(tmp_path):
+    first, second = _workers(tmp_path, user_limit=0, global_limit=1000)
+    first.admit("a", 600, policy="reject")
+    with pytest.raises(TokenBudgetExceeded):
+        second.admit("b", 600, policy="reject")
+
+
+def test_settle_frees_tokens_for_other_workers(tmp_path):
+    first, second = _workers(tmp_path, user_limit=1000, global_limit=0)
+    _, reservation = first.admit("u", 900, policy="reject")
+    first.settle(reservation, 100)
+    second.admit("u", 800, policy="reject")
+
+
+def test_unusable_file_falls_back_to_per_worker_windows(tmp_path):
+    budget = TokenBudget(user_limit=1000, global_limit=0, path=str(tmp_path / "missing" / "cache.sqlite3"))
+    assert budget._shared is None
+    budget.admit("u", 900, policy="reject")
+    with pytest.raises(TokenBudgetExceeded):
+        budget.admit("u", 200, policy="reject")
+
+
+# --- SummarizerTool.run admission (non-streamed) ---
+
+def _tool(calls: list) -> SummarizerTool:
+    tool = SummarizerTool()
+
+    def fake_llm(prompt, text, state, role="map"):
+        calls.append((role, len(text)))
+        state.usage.record(500, 100)
+        return "short summary"
+
+    tool._call_llm = fake_llm
+    return tool
+
+
+def _run(monkeypatch, budget, policy, text=ARTICLE):
+    calls = []
+    monkeypatch.setattr(summarizer_tool, "BUDGET", budget)
+    context = {"user_id": "u", "token_usage": TokenUsage()}
+    summary = _tool(calls).run(text, context, {"budget_policy": policy})
+    return summary, context, calls
+
+
+def test_run_admitted_and_settled(monkeypatch):
+    budget = TokenBudget(user_limit=100000, global_limit=0)
+    summary, context, calls = _run(monkeypatch, budget, "reject")
+    assert summary == "short summary" and len(calls) == 1
+    assert context["token_usage"].decision == ADMIT
+    assert [tokens for _, tokens in budget._users["u"]] == [600]
+
+
+def test_run_rejected_before_any_llm_call(monkeypatch):
+    budget = TokenBudget(user_limit=3000, global_limit=0)
+    budget.admit("u", 2500)
+    with pytest.raises(TokenBudgetExceeded):
+        _run(monkeypatch, budget, "reject")
+
+
+def test_run_downgraded_to_hybrid(monkeypatch):
+    budget = TokenBudget(user_limit=3000, global_limit=0)
+    budget.admit("u", 1000)   # full run (~2.6k tokens) no longer fits, a 3k-char extract does
+    summary, context, calls = _run(monkeypatch, budget, "downgrade")
+    assert context["token_usage"].decision == token_budget.DOWNGRADE
+    assert context["summarizer_details"]["mode"] == "hybrid"
+    assert calls == [("map", calls[0][1])] and calls[0][1] <= SummarizerTool.HYBRID_MAX_CHARS // 2
+
+
+def test_run_queued_until_the_window_frees_up(monkeypatch):
+    monkeypatch.setattr(token_budget, "WINDOW_SECONDS", 0.5)
+    budget = TokenBudget(user_limit=3000, global_limit=0)
+    budget.admit("u", 2500)
+    summary, context, calls = _run(monkeypatch, budget, "queue")
+    assert summary == "short summary" and len(calls) == 1
+    assert [tokens for _, tokens in budget._users["u"]] == [600]   # the old entry slid out
+
+
+def test_run_queue_gives_up_after_max_wait(monkeypatch):
+    monkeypatch.setattr(token_budget, "TOKEN_BUDGET_MAX_WAIT", 1.5)
+    budget = TokenBudget(user_limit=3000, global_limit=0)
+    budget.admit("u", 2500)
+    with pytest.raises(TokenBudgetExceeded):
+        _run(monkeypatch, budget, "queue")
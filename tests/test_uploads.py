@@ -0,0 +1,132 @@
+import io
+import tempfile
+import zipfile
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from backend.services.uploads import UploadedDocument
+from backend.tools.summarizer_tool import SummarizerTool
+
+SPOOL_BYTES = 1024   # small spool so every test file rolls over to disk, like uploads past UPLOAD_SPOOL_BYTES
+
+
+def _spooled_upload(data: bytes, filename: str) -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(spooled, filename=filename)
+
+
+def _pdf_bytes(text: str, padding: int = 4 * SPOOL_BYTES) -> bytes:
+    content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%" + b"x" * padding + b"\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _docx_bytes(paragraphs: list) -> bytes:
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    out = io.BytesIO()
+    document.save(out)
+    # a stored (uncompressed) padding entry pushes the file past the spool size
+    with zipfile.ZipFile(out, "a", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("customXml/padding.bin", b"\0" * 4 * SPOOL_BYTES)
+    return out.getvalue()
+
+
+def _extract(data: bytes, filename: str):
+    document = UploadedDocument(_spooled_upload(data, filename))
+    try:
+        assert document._mmap is not None, "test file should have rolled over to disk"
+        return SummarizerTool()._extract_text_from_file(document)
+    finally:
+        document.close()
+
+
+def test_mapped_file_is_seekable_file_object():
+    document = UploadedDocument(_spooled_upload(b"0123456789" * 500, "digits.txt"))
+    try:
+        stream = document.file
+        assert stream.seekable() and stream.readable()
+        assert stream.seek(-10, io.SEEK_END) == 4990
+        assert stream.read(4) == b"0123"
+        assert stream.tell() == 4994
+        stream.seek(0)
+        assert len(stream.read()) == 5000
+    finally:
+        document.close()
+
+
+def test_docx_upload_past_spool_threshold():
+    text, source = _extract(_docx_bytes(["First paragraph.", "Second paragraph."]), "report.docx")
+    assert source == "DOCX: report.docx"
+    assert "First paragraph." in text and "Second paragraph." in text
+
+
+def test_pdf_upload_past_spool_threshold():
+    pytest.importorskip("PyPDF2")
+    text, source = _extract(_pdf_bytes("Hello from a mapped PDF"), "paper.pdf")
+    assert source == "PDF: paper.pdf"
+    assert "Hello from a mapped PDF" in text
+
+
+def test_text_upload_past_spool_threshold():
+    body = ("Café line with multibyte characters ✓\n" * 400).encode("utf-8")
+    text, source = _extract(body, "notes.txt")
+    assert source == "Text: notes.txt"
+    assert text == body.decode("utf-8")
+
+
+def _upload(api, headers, agent_name: str, body: bytes):
+    return api.post(
+        "/run-task/upload", headers=headers,
+        data={"agent_name": agent_name, "session_id": "u"},
+        files={"file": ("notes.txt", body, "text/plain")},
+    )
+
+
+def test_upload_endpoint_spools_with_its_own_parser(api, make_user, make_agent, monkeypatch):
+    from starlette.formparsers import MultiPartParser
+    from backend.services.uploads import UploadParser
+
+    user_id, headers = make_user()
+    make_agent(user_id, "doc-agent", {"tools": [{"name": "document"}]})
+    monkeypatch.setattr(UploadParser, "spool_max_size", SPOOL_BYTES)
+
+    small = _upload(api, headers, "doc-agent", b"x" * 100)
+    assert small.json()["output"] == "notes.txt: 100 bytes, mapped=False"
+    large = _upload(api, headers, "doc-agent", b"x" * (4 * SPOOL_BYTES))
+    assert large.json()["output"] == f"notes.txt: {4 * SPOOL_BYTES} bytes, mapped=True"
+    assert MultiPartParser.spool_max_size == 1024 * 1024   # other forms in the process keep Starlette's default
+
+
+def test_upload_limits_and_missing_fields(api, make_user, make_agent, monkeypatch):
+    from backend.services import uploads
+
+    user_id, headers = make_user()
+    make_agent(user_id, "doc-limits", {"tools": [{"name": "document"}]})
+    monkeypatch.setattr(uploads.parse_upload_form, "__defaults__", (SPOOL_BYTES,))
+    assert _upload(api, headers, "doc-limits", b"x" * (2 * SPOOL_BYTES)).status_code == 413
+    response = api.post("/run-task/upload", headers=headers, json={"agent_name": "doc-limits"})
+    assert response.status_code == 422